@@ -13,45 +13,88 @@
 
 # Standard Helpers
 import os
+import json
+import time
 
 # OpenAI; OPENAI_API_KEY muss als Systemvariable gesetzt sein
-import openai
-openai.api_key = os.getenv('OPENAI_API_KEY')
+# Alle Aufrufe laufen über den gemeinsamen Client (Connection-Pool, Wiederholungen bei 429/5xx)
+import openai_client
 MODEL_ID = "gpt-4-turbo" # GPT-4 Turbo
+REQUEST_TIMEOUT = 120 # maximale Dauer eines einzelnen LLM-Aufrufs in Sekunden
 
-# PDF Document Loader
-from pypdf import PdfReader
+# Lange Dokumente werden abschnittsweise zusammengefasst (Map-Reduce)
+SINGLE_PASS_TOKENS = 30000 # bis zu dieser Größe wird das Dokument in einem einzigen Aufruf zusammengefasst
+MAX_CHUNK_TOKENS = 8000 # maximale Größe eines Abschnitts
+MAX_PARALLEL_CHUNKS = 4 # maximale Anzahl gleichzeitiger Aufrufe für die Abschnitte
+
+STREAM_SUMMARY = True # Zusammenfassung Token für Token anzeigen, sobald die ersten Tokens eintreffen
+
+# PDF Document Loader (Backends: "pypdf", "pymupdf", "pymupdf-blocks", siehe pdf_extraction.py)
+import pdf_extraction
+PDF_BACKEND = os.getenv("PDF_BACKEND", "pypdf")
+# Kompaktierung des extrahierten Texts vor dem Prompt (PROMPT_COMPACTION=0 schaltet sie ab)
+import text_compaction
 
 # Streamlit
 import streamlit as st
 
-def open_pdf(uploaded_file):
+# Cache für extrahierten PDF-Text (gemeinsam mit openai_clone_v4.py)
+import pdf_cache
+# Persistenter Cache für Titel, Autor & Seitenzahl
+import metadata_cache
+# Lokale Ermittlung von Titel & Autor (PDF-Metadaten & Layout der ersten Seite)
+import pdf_metadata
+# Optionale Laufzeit-Messung je Rerun (PERF_INSTRUMENTATION=1)
+import instrumentation
+# Map-Reduce Zusammenfassung für lange Dokumente
+import chunked_summary
+# Schwere Bibliotheken & Caches nach der ersten Anzeige im Hintergrund laden
+import prewarm
+import response_cache
+# Warteschlange für Zusammenfassungen im Hintergrund (SQLite)
+import summary_jobs
+# Gleichzeitige identische Berechnungen (dasselbe PDF in mehreren Sessions) nur einmal ausführen
+import single_flight
+JOB_POLL_INTERVAL = "1s" # so oft fragt die Oberfläche den Status eines laufenden Auftrags ab
+
+def pages_without_appendix(number_of_pages):
+    # Extraktor: Seiten der Reihe nach extrahieren (große PDFs bereichsweise parallel) und an der Überschrift des
+    # Literaturverzeichnisses aufhören (Überschriften siehe pdf_extraction.APPENDIX_MARKERS)
+    def extract(pdf_bytes):
+        return pdf_extraction.pages_before_appendix(pdf_extraction.iter_pages(pdf_bytes, PDF_BACKEND), number_of_pages=number_of_pages)
+    return extract
+
+def pdf_pages(uploaded_file, doc_hash=None):
     
-    # PDF Datei mit PyPDF laden & Text extrahieren
+    # PDF Datei laden & Text seitenweise extrahieren; bei wiederholten Aufrufen kommen Seitenzahl & Text aus dem Cache
+    # Rückgabe: Seitenzahl des PDFs und Liste der Seitentexte ohne Literaturangaben
     if uploaded_file:
-        reader = PdfReader(uploaded_file)
-        number_of_pages = len(reader.pages)
-        pages_text = []
-        for page_num in range(0, number_of_pages):
-            text = reader.pages[page_num].extract_text()
-            pages_text.append(text)
+        pdf_bytes = uploaded_file.getvalue()
+        doc_hash = doc_hash or pdf_cache.document_hash(pdf_bytes)
+        # Die Seitenzahl liegt als Liste mit einem Eintrag unter einem eigenen Schlüssel im Cache
+        number_of_pages, = pdf_cache.cached_pages(pdf_bytes, f"{PDF_BACKEND}-seitenzahl",
+                                                  lambda data: [pdf_extraction.page_count(data, PDF_BACKEND)], doc_hash)
 
         # Gibt zu Kontrolle im Terminalfenster zusätzliche Informationen aus
         print(f"\nDatei: {uploaded_file.name}")
         print(f"Umfang: {number_of_pages} Seiten")
 
-        # Das Kapitel mit den Literaturangaben (= 'References') weglassen
-        KEY_WORD_ANHANG = 'References' # kennzeichnet im englischen Raum den Beginn des Anhangs
-        for seitennr, page in enumerate(pages_text):
-            if KEY_WORD_ANHANG in page:
-                print(f"Keyword auf Seite {seitennr+1} gefunden")
-                pages_text = pages_text[:seitennr]
+        # Das Kapitel mit den Literaturangaben (= 'References') weglassen; die Seiten dahinter werden gar nicht erst extrahiert
+        with instrumentation.span("pdf.extract", backend=PDF_BACKEND, pages=number_of_pages):
+            # Kopf- & Fußzeilen, Seitenzahlen, Worttrennungen & Leerraum kosten nur Tokens (siehe text_compaction.py)
+            pages_text = pdf_cache.cached_pages(pdf_bytes, f"{PDF_BACKEND}-ohne-anhang{text_compaction.CACHE_SUFFIX}",
+                                                text_compaction.compacted(pages_without_appendix(number_of_pages)), doc_hash)
 
-        # 'all_pages' enthält gesamten PDF-Text als Typ String aber keinerlei Metadaten
-        all_pages_text = "\n\n".join(pages_text)
-        return number_of_pages, all_pages_text
+        return number_of_pages, pages_text
     else:
-        return 0, ""
+        return 0, []
+
+def open_pdf(uploaded_file):
+    number_of_pages, pages_text = pdf_pages(uploaded_file)
+
+    # 'all_pages' enthält gesamten PDF-Text als Typ String aber keinerlei Metadaten
+    all_pages_text = "\n\n".join(pages_text)
+    return number_of_pages, all_pages_text
 
 def title_of_article(full_text):
     human_message_prompt = f"""
@@ -68,13 +111,14 @@ def title_of_article(full_text):
 
     chat_prompt = [{"role": "user", "content": human_message_prompt }]
 
-    response = openai.ChatCompletion.create(
+    response = openai_client.chat_completion(
         model=MODEL_ID,
         temperature=0,
-        messages=chat_prompt
+        messages=chat_prompt,
+        timeout=REQUEST_TIMEOUT
     )
 
-    return response.choices[0].message['content']
+    return response.choices[0].message.content
 
 def autor_of_article(full_text):
     human_message_prompt = f"""
@@ -91,17 +135,45 @@ def autor_of_article(full_text):
 
     chat_prompt = [{"role": "user", "content": human_message_prompt }]
 
-    response = openai.ChatCompletion.create(
+    response = openai_client.chat_completion(
+        model=MODEL_ID,
+        temperature=0,
+        messages=chat_prompt,
+        timeout=REQUEST_TIMEOUT
+    )
+
+    return response.choices[0].message.content
+
+def title_and_autor_of_article(full_text):
+    # Titel & Autor in einem einzigen Aufruf ermitteln; die Antwort kommt als JSON-Objekt zurück
+    human_message_prompt = f"""
+    Enclosed you find the beginning of a scientific article. 
+    What are the title and the autor of the article? 
+    Analysiere insbesondere die allerersten Zeilen des Dokuments, da Titel und Autoren typischerweise ganz am Anfang stehen.
+    Return a JSON object with exactly two keys: "title" and "autor". 
+    Never make up facts. If you don't know a value, return an empty string for it.
+    
+    Scientific Article:
+
+    {full_text}
+    """ 
+
+    chat_prompt = [{"role": "user", "content": human_message_prompt }]
+
+    response = openai_client.chat_completion(
         model=MODEL_ID,
         temperature=0,
-        messages=chat_prompt
+        messages=chat_prompt,
+        response_format={"type": "json_object"},
+        timeout=REQUEST_TIMEOUT
     )
 
-    return response.choices[0].message['content']
+    answer = json.loads(response.choices[0].message.content)
+    return answer.get("title", ""), answer.get("autor", "")
 
 
-def create_summary(full_text):
-    # Prompt erstellen
+def summary_prompt(full_text, source="Scientific Article"):
+    # Prompt erstellen; 'source' beschreibt, ob der Artikel selbst oder Teilzusammenfassungen übergeben werden
     human_message_prompt = f"""
     You will be given one scientific article. Your task is to write a world-class summary. Please make sure you read and understand these instructions very carefully. \
 
@@ -120,7 +192,7 @@ def create_summary(full_text):
     Write a long & detailed summary of at least 4-5 paragraphs according to the above criteria.
     Always write the summary in German!
 
-    Scientific Article:
+    {source}:
 
     {full_text}
 
@@ -140,28 +212,150 @@ def create_summary(full_text):
         - ...
 
     """
+    return human_message_prompt
+
+
+def summary_completion(human_message_prompt, stream=False):
     chat_prompt = [{"role": "user", "content": human_message_prompt }]
 
     # Aufruf von OpenAI GPT-4 Turbo (ohne Langchain)
-    response = openai.ChatCompletion.create(
+    response = openai_client.chat_completion(
         model=MODEL_ID,
         temperature=0,
-        messages=chat_prompt
+        messages=chat_prompt,
+        timeout=REQUEST_TIMEOUT,
+        stream=stream
     )
 
+    # Im Streaming-Modus die Textstücke liefern, sobald sie eintreffen
+    if stream:
+        return (chunk.choices[0].delta.content or '' for chunk in response if chunk.choices)
+
     # Gibt zu Kontrolle im Terminalfenster zusätzliche Informationen aus
-    print(f"Insgesamt {response['usage']['total_tokens']} Tokens verbraucht für die Zusammenfassung")
-    return response.choices[0].message['content']
+    print(f"Insgesamt {response.usage.total_tokens} Tokens verbraucht für die Zusammenfassung")
+    return response.choices[0].message.content
 
 
-def save_summary(summary_text):
-    st.download_button('Summary speichern', summary_text)
-    st.success('Done!')
+def summarize_chunk(chunk_text, first_page, last_page):
+    # Map-Schritt: einen Abschnitt des Artikels in Stichpunkten zusammenfassen
+    human_message_prompt = f"""
+    You will be given pages {first_page} to {last_page} of a scientific article.
+    Extract the important results, conclusions and limitations stated in this part as concise bullet points.
+    Only use statements that are entailed by the text. Always write in German!
+
+    Part of Scientific Article:
+
+    {chunk_text}
+    """
+    return summary_completion(human_message_prompt)
+
+
+def create_summary(full_text, pages=None, stream=False):
+    # Kurze Dokumente in einem Aufruf zusammenfassen; lange Dokumente (Seitenliste vorhanden) per Map-Reduce
+    # Mit 'stream=True' wird ein Generator über die Textstücke zurückgegeben (bei Map-Reduce nur für den Reduce-Schritt)
+    if pages is None or chunked_summary.estimate_tokens(full_text) <= SINGLE_PASS_TOKENS:
+        return summary_completion(summary_prompt(full_text), stream=stream)
+
+    chunks = chunked_summary.chunk_pages(pages, MAX_CHUNK_TOKENS)
+    print(f"Dokument zu lang für einen Aufruf - Zusammenfassung in {len(chunks)} Abschnitten")
+    partial_summaries = chunked_summary.map_chunks(chunks, summarize_chunk, MAX_PARALLEL_CHUNKS)
+
+    # Reduce-Schritt: aus den Teilzusammenfassungen die Zusammenfassung in der gewohnten Struktur erstellen
+    notes = "\n\n".join(f"Seiten {first}-{last}:\n{summary}" for (first, last, _), summary in zip(chunks, partial_summaries))
+    return summary_completion(summary_prompt(notes, source="Notes on all parts of the Scientific Article (in page order)"), stream=stream)
+
+
+def run_pipeline(uploaded_file, doc_hash):
+    # Titel & Autor ermitteln; bereits bekannte Metadaten (samt Seitenzahl) kommen aus dem Cache, das PDF wird dann
+    # gar nicht geöffnet. Die Zusammenfassung läuft getrennt davon als Auftrag in summary_jobs.
+    metadata = metadata_cache.get(doc_hash, MODEL_ID)
+    if metadata is not None:
+        return metadata, {}
+    num_pages, pages = pdf_pages(uploaded_file, doc_hash)
+    full_text = "\n\n".join(pages)
+
+    # Titel & Autor zuerst lokal ermitteln; nur bei geringer Konfidenz folgt ein kombinierter LLM-Aufruf
+    # (mit eigenem Timeout REQUEST_TIMEOUT). Laden mehrere Sessions gleichzeitig dasselbe PDF hoch, läuft jeder
+    # Schritt nur einmal (single_flight.py)
+    latencies = {}
+    local = single_flight.run((doc_hash, "metadata-local"), lambda: pdf_metadata.extract_title_and_autor(uploaded_file.getvalue()))
+    title, autor = local["title"], local["autor"]
+    complete = True
+    if min(local["title_confidence"], local["autor_confidence"]) < pdf_metadata.MIN_CONFIDENCE:
+        start = time.perf_counter()
+        try:
+            llm_title, llm_autor = single_flight.run((doc_hash, "title-autor", MODEL_ID), lambda: title_and_autor_of_article(full_text[:1000]))
+            if local["title_confidence"] < pdf_metadata.MIN_CONFIDENCE:
+                title = llm_title
+            if local["autor_confidence"] < pdf_metadata.MIN_CONFIDENCE:
+                autor = llm_autor
+        except Exception as e:
+            print(f"Titel & Autor konnten nicht per LLM ermittelt werden: {e}")
+            complete = False
+        latencies["Titel & Autor"] = time.perf_counter() - start
+        print(f"Latenz Titel & Autor: {latencies['Titel & Autor']:.1f}s")
+
+    metadata = {"title": title, "autor": autor, "num_pages": num_pages}
+    # Nur vollständige Ergebnisse dauerhaft speichern, damit fehlgeschlagene Aufrufe beim nächsten Mal wiederholt werden
+    if complete:
+        metadata_cache.put(doc_hash, MODEL_ID, metadata)
+
+    return metadata, latencies
+
+
+def show_latencies(latencies):
+    # Latenz je Stufe anzeigen
+    if latencies:
+        st.caption("Latenz: " + " | ".join(f"{stage} {seconds:.1f}s" for stage, seconds in latencies.items()))
+
+
+def summary_work(pages, refresh=False):
+    # Läuft im Hintergrund-Thread von summary_jobs - hier keine Streamlit-Aufrufe
+    # 'refresh': neu erstellen, ohne die Antworten aus dem LLM-Cache zu verwenden
+    def work(report):
+        if refresh:
+            with openai_client.refreshed_cache():
+                return create(report)
+        return create(report)
+
+    def create(report):
+        full_text = "\n\n".join(pages)
+        if not STREAM_SUMMARY:
+            return create_summary(full_text, pages)
+        summary_text = ""
+        for part in create_summary(full_text, pages, stream=True):
+            summary_text += part
+            report(summary_text)
+        return summary_text
+    return work
+
+
+def job_latencies(job):
+    # Latenz je Stufe aus den Zeitstempeln des Auftrags
+    latencies = {}
+    if job["started"] and job["first_output"]:
+        latencies["Erstes Token"] = job["first_output"] - job["started"]
+    if job["started"] and job["finished"]:
+        latencies["Summary"] = job["finished"] - job["started"]
+    return latencies
+
+
+@st.fragment(run_every=JOB_POLL_INTERVAL)
+def show_running_job(doc_hash):
+    # Fragt nur den Status des Auftrags ab, ohne das ganze Skript neu auszuführen
+    job = summary_jobs.get(doc_hash, MODEL_ID)
+    if job["status"] not in ("queued", "running"):
+        st.rerun() # fertig: einmal komplett neu zeichnen, damit Textfeld & Download-Button erscheinen
+    if job["partial"]:
+        st.markdown(job["partial"])
+    st.caption('Ich erstelle jetzt eine Zusammenfassung ...' if job["status"] == "running"
+               else 'Die Zusammenfassung wartet auf einen freien Platz in der Warteschlange ...')
 
 
 #
 # Erstellt das Fenster mit Streamlit
 #
+@instrumentation.instrumented_run
 def main():
     st.set_page_config(page_title='PDF Summary Generator', layout="centered")
     st.header("Laras PDF Summary Generator", divider = True)
@@ -169,28 +363,46 @@ def main():
     # Datei-Upload
     uploaded_file = st.file_uploader("Wähle eine PDF-Datei aus, für die ich eine Zusammenfassung erstellen soll", type="pdf")
     if uploaded_file is not None:
-        num_pages, full_text = open_pdf(uploaded_file)
-        title = title_of_article(full_text[:1000])
-        if title == 'I could not find a title.':
-            title = ''
-        autor = autor_of_article(full_text[:1000])
-        if autor == 'I could not find an autor.':
-            autor = ''
-        st.success(f'PDF mit dem Titel "{title}" und {num_pages} Seiten erfolgreich geladen!', icon="✅")
-        
-        # Zusammenfassung erstellen
-        if st.button('Summary erstellen'):
-            with st.spinner(f'Ich erstelle jetzt eine Zusammenfassung - das dauert ca 30 Sekunden'):
-                summary_text = create_summary(full_text)
-            st.text_area("Zusammenfassung", f"Titel: {title}\nAutor: {autor}\n\n{summary_text}", height=600)
-
-            # Zusammenfassung speichern
-            st.download_button('Summary speichern', 
-                               f'Titel: {title}\nAutor: {autor}\n\n{summary_text}',
-                               file_name=uploaded_file.name[:-4]+'.txt'
-                               )
+        doc_hash = pdf_cache.document_hash(uploaded_file.getvalue()) # Schlüssel für Caches & Auftrag, nur einmal berechnet
+        metadata, latencies = run_pipeline(uploaded_file, doc_hash)
+        title, autor = metadata["title"], metadata["autor"]
+        st.success(f'PDF mit dem Titel "{title}" und {metadata["num_pages"]} Seiten erfolgreich geladen!', icon="✅")
+        show_latencies(latencies)
+
+        # Zusammenfassung als Hintergrund-Auftrag; ein bereits laufender oder fertiger Auftrag
+        # (auch aus einer früheren Session mit demselben PDF) wird direkt angezeigt
+        job = summary_jobs.get(doc_hash, MODEL_ID)
+        if job is None or job["status"] == "error":
+            if job is not None:
+                st.error(f"Die Zusammenfassung konnte nicht erstellt werden: {job['error']}")
+            if not st.button('Summary erstellen'):
+                return
+            num_pages, pages = pdf_pages(uploaded_file, doc_hash)
+            job = summary_jobs.submit(doc_hash, MODEL_ID, summary_work(pages))
+
+        if job["status"] != "done":
+            show_running_job(doc_hash)
+            return
+
+        summary_text = job["result"]
+        show_latencies(job_latencies(job))
+        st.text_area("Zusammenfassung", f"Titel: {title}\nAutor: {autor}\n\n{summary_text}", height=600)
+
+        # Zusammenfassung speichern
+        st.download_button('Summary speichern', 
+                           f'Titel: {title}\nAutor: {autor}\n\n{summary_text}',
+                           file_name=uploaded_file.name[:-4]+'.txt'
+                           )
+
+        # Fertige Zusammenfassungen bleiben gespeichert; auf Wunsch neu erstellen
+        if st.button('Summary neu erstellen'):
+            num_pages, pages = pdf_pages(uploaded_file, doc_hash)
+            summary_jobs.submit(doc_hash, MODEL_ID, summary_work(pages, refresh=True), force=True)
+            st.rerun()
 
 
 # Refresh des Fensters erzwingen zur korrekten Anzeige
 if __name__ == "__main__":
     main()
+    prewarm.start(modules=("openai", "openai.types.chat", "fitz", "pypdf"),
+                  resources=(openai_client.get_client, response_cache.stats, lambda: metadata_cache.get("", MODEL_ID)))
@@ -0,0 +1,165 @@
+# Zusammenfassungen für viele PDFs ohne Streamlit-Oberfläche erstellen
+# Nutzt dieselben Funktionen wie PDF_Summary_Streamlit.py (pdf_pages, title_of_article, autor_of_article, create_summary)
+# und schreibt pro PDF eine .txt Datei mit demselben Namen und Inhalt wie der Button 'Summary speichern'.
+#
+# - Die Text-Extraktion läuft in einem Prozess-Pool (--workers)
+# - Die OpenAI-Aufrufe laufen mit begrenzter Parallelität (--concurrency Dokumente gleichzeitig)
+# - Fertige Dokumente werden in einer Manifest-Datei (JSON Lines) protokolliert; ein abgebrochener Lauf
+#   setzt beim erneuten Start dort fort, wo er aufgehört hat
+#
+# Aufruf: python batch_summary.py papers/ "more/*.pdf" --output-dir summaries [--workers 4] [--concurrency 4]
+
+import os
+import sys
+import glob
+import json
+import argparse
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import PDF_Summary_Streamlit as app
+import pdf_cache
+import pdf_metadata
+import metadata_cache
+
+
+class PdfFile:
+    # Minimaler Ersatz für Streamlits UploadedFile, damit pdf_pages() unverändert genutzt werden kann
+    def __init__(self, path):
+        self.name = os.path.basename(path)
+        with open(path, "rb") as f:
+            self._data = f.read()
+
+    def getvalue(self):
+        return self._data
+
+
+def find_pdfs(inputs, recursive=False):
+    paths = []
+    for entry in inputs:
+        if os.path.isdir(entry):
+            pattern = os.path.join(entry, "**", "*.pdf") if recursive else os.path.join(entry, "*.pdf")
+            paths += sorted(glob.glob(pattern, recursive=recursive))
+        else:
+            paths += sorted(glob.glob(entry, recursive=recursive))
+    # Reihenfolge beibehalten, Duplikate entfernen
+    return list(dict.fromkeys(os.path.abspath(path) for path in paths if path.lower().endswith(".pdf")))
+
+
+def extract(path):
+    # Läuft im Worker-Prozess: Text & lokal ermittelte Metadaten eines PDFs
+    pdf_file = PdfFile(path)
+    doc_hash = pdf_cache.document_hash(pdf_file.getvalue())
+    num_pages, pages = app.pdf_pages(pdf_file, doc_hash)
+    local = pdf_metadata.extract_title_and_autor(pdf_file.getvalue())
+    return {"path": path, "doc_hash": doc_hash, "num_pages": num_pages,
+            "full_text": "\n\n".join(pages), "pages": pages, "local": local}
+
+
+def summarize(document):
+    # Titel & Autor: zuerst Cache, dann lokal, nur bei geringer Konfidenz per LLM
+    metadata = metadata_cache.get(document["doc_hash"], app.MODEL_ID)
+    if metadata is None:
+        local, full_text = document["local"], document["full_text"]
+        title, autor = local["title"], local["autor"]
+        if local["title_confidence"] < pdf_metadata.MIN_CONFIDENCE:
+            title = app.title_of_article(full_text[:1000])
+            if title == 'I could not find a title.':
+                title = ''
+        if local["autor_confidence"] < pdf_metadata.MIN_CONFIDENCE:
+            autor = app.autor_of_article(full_text[:1000])
+            if autor == 'I could not find an autor.':
+                autor = ''
+        metadata = {"title": title, "autor": autor, "num_pages": document["num_pages"]}
+        metadata_cache.put(document["doc_hash"], app.MODEL_ID, metadata)
+
+    summary_text = app.create_summary(document["full_text"], document["pages"])
+    return f'Titel: {metadata["title"]}\nAutor: {metadata["autor"]}\n\n{summary_text}'
+
+
+def load_manifest(manifest_path):
+    # Letzter Eintrag je Datei-Hash gewinnt
+    done = {}
+    if os.path.exists(manifest_path):
+        with open(manifest_path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue # unvollständige Zeile nach einem Abbruch
+                done[entry["sha256"]] = entry
+    return done
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Erstellt Zusammenfassungen für alle PDFs in Verzeichnissen oder Glob-Mustern")
+    parser.add_argument("inputs", nargs="+", help="Verzeichnisse oder Glob-Muster, z.B. 'papers/' oder 'papers/**/*.pdf'")
+    parser.add_argument("--output-dir", default="summaries", help="Zielverzeichnis für die .txt Dateien")
+    parser.add_argument("--manifest", help="Manifest-Datei (Default: <output-dir>/manifest.jsonl)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Prozesse für die Text-Extraktion")
+    parser.add_argument("--concurrency", type=int, default=4, help="Dokumente, die gleichzeitig an OpenAI geschickt werden")
+    parser.add_argument("--recursive", action="store_true", help="Verzeichnisse rekursiv durchsuchen")
+    parser.add_argument("--retry-failed", action="store_true", help="Im Manifest als fehlerhaft markierte Dateien erneut versuchen")
+    args = parser.parse_args()
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    manifest_path = args.manifest or os.path.join(args.output_dir, "manifest.jsonl")
+    manifest = load_manifest(manifest_path)
+    manifest_lock = threading.Lock()
+
+    paths = find_pdfs(args.inputs, args.recursive)
+    todo = []
+    for path in paths:
+        doc_hash = pdf_cache.document_hash(PdfFile(path).getvalue())
+        entry = manifest.get(doc_hash)
+        if entry and (entry["status"] == "done" and os.path.exists(entry["output"]) or entry["status"] == "error" and not args.retry_failed):
+            continue
+        todo.append((path, doc_hash))
+    print(f"{len(paths)} PDFs gefunden, {len(paths) - len(todo)} bereits erledigt, {len(todo)} zu verarbeiten")
+
+    used_names = {}
+    counts = {"done": 0, "error": 0}
+
+    def record(entry):
+        with manifest_lock:
+            counts[entry["status"]] += 1
+            with open(manifest_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            print(f"[{counts['done'] + counts['error']}/{len(todo)}] {entry['status']}: {entry['file']}")
+
+    def process(path, doc_hash, extraction):
+        # Läuft im Thread-Pool: wartet auf die Extraktion im Prozess-Pool, dann die OpenAI-Aufrufe
+        try:
+            document = extraction.result()
+            text = summarize(document)
+            # Dateiname wie beim Download-Button; gleichnamige PDFs aus verschiedenen Verzeichnissen bekommen den Hash angehängt
+            name = os.path.basename(document["path"])[:-4]
+            with manifest_lock:
+                if used_names.setdefault(name, document["doc_hash"]) != document["doc_hash"]:
+                    name = f"{name}-{document['doc_hash'][:8]}"
+            output = os.path.join(args.output_dir, name + '.txt')
+            with open(output, "w", encoding="utf-8") as f:
+                f.write(text)
+            record({"file": path, "sha256": doc_hash, "status": "done", "output": output})
+        except Exception as e:
+            record({"file": path, "sha256": doc_hash, "status": "error", "output": "", "error": str(e)})
+        finally:
+            in_flight.release()
+
+    # Höchstens doppelt so viele extrahierte Dokumente im Speicher halten, wie gerade zusammengefasst werden
+    in_flight = threading.BoundedSemaphore(2 * args.concurrency)
+    try:
+        with ProcessPoolExecutor(max_workers=args.workers) as extractors, ThreadPoolExecutor(max_workers=args.concurrency) as summarizers:
+            for path, doc_hash in todo:
+                in_flight.acquire()
+                summarizers.submit(process, path, doc_hash, extractors.submit(extract, path))
+    except KeyboardInterrupt:
+        print("Abgebrochen - beim nächsten Start wird mit den noch offenen Dateien fortgesetzt")
+        sys.exit(1)
+
+    print(f"Fertig: {counts['done']} erfolgreich, {counts['error']} mit Fehler, Manifest: {manifest_path}")
+    sys.exit(1 if counts["error"] else 0)
+
+
+if __name__ == "__main__":
+    main()
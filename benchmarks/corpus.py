@@ -0,0 +1,101 @@
+# Synthetischer Korpus für die Benchmarks: wissenschaftlich aufgebaute PDFs & große Fotos
+# - PDFs mit Titelseite (großer Titel, Autorenzeile), Kopfzeile & Seitenzahl auf jeder Seite,
+#   Fließtext mit Silbentrennung und einem Literaturverzeichnis auf den letzten ~10% der Seiten
+# - Bilder als JPEG (Foto-ähnlich mit Rauschen) und PNG mit Transparenz
+# Der Inhalt hängt nur von 'seed' ab, die Dateien sind also bei jedem Lauf identisch.
+#
+# Aufruf: python benchmarks/corpus.py benchmarks/corpus [--pages 8 40 200]
+
+import os
+import random
+import argparse
+
+import fitz  # PyMuPDF
+from PIL import Image
+
+PDF_PAGES = (8, 40, 200)
+IMAGES = (("photo.jpg", (4032, 3024)), ("screenshot.png", (2880, 1800)))
+
+_WORDS = ("cache latency throughput memory request response model token document extraction summary "
+          "benchmark experiment result analysis distributed system performance evaluation baseline").split()
+
+
+def _sentence(rng):
+    words = [rng.choice(_WORDS) for _ in range(rng.randint(8, 16))]
+    return " ".join(words).capitalize() + "."
+
+
+def make_pdf(path, pages, seed=0):
+    rng = random.Random(seed)
+    doc = fitz.open()
+    references_from = max(1, int(pages * 0.9))
+    for page_num in range(pages):
+        page = doc.new_page()
+        page.insert_text((72, 40), "Journal of Synthetic Benchmarks  Vol. 7  No. 2", fontsize=8)
+        y = 90
+        if page_num == 0:
+            page.insert_text((72, y), "Caching Strategies for Document Summarization", fontsize=20)
+            page.insert_text((72, y + 30), "Erika Mustermann, Max Mustermann", fontsize=11)
+            y += 70
+        if page_num == references_from:
+            page.insert_text((72, y), "References", fontsize=12)
+            y += 24
+        while y < 770:
+            if page_num >= references_from:
+                line = f"[{rng.randint(1, 99)}] {rng.choice(_WORDS).capitalize()}, A. {_sentence(rng)} {rng.randint(1990, 2024)}."
+            else:
+                line = _sentence(rng)
+                # Silbentrennung am Zeilenende wie in gesetzten Artikeln
+                if rng.random() < 0.15:
+                    line = line[:-1] + " sum-"
+            page.insert_text((72, y), line[:95], fontsize=10)
+            y += 13
+        page.insert_text((300, 810), str(page_num + 1), fontsize=8)
+    doc.save(path)
+    doc.close()
+
+
+def make_image(path, size, seed=0):
+    rng = random.Random(seed)
+    # Grobes Rauschen hochskaliert + feines Rauschen: komprimiert ähnlich schlecht wie ein Foto
+    coarse = Image.frombytes("RGB", (64, 48), bytes(rng.randrange(256) for _ in range(64 * 48 * 3))).resize(size, Image.BICUBIC)
+    fine = Image.effect_noise(size, 40).convert("RGB")
+    image = Image.blend(coarse, fine, 0.25)
+    if path.endswith(".png"):
+        image = image.convert("RGBA")
+        image.putalpha(Image.linear_gradient("L").resize(size))
+        image.save(path)
+    else:
+        image.save(path, quality=95)
+
+
+def generate(out_dir, pdf_pages=PDF_PAGES, seed=0):
+    """Erzeugt den Korpus (sofern noch nicht vorhanden); Rückgabe: Pfade der PDFs & Bilder"""
+    os.makedirs(out_dir, exist_ok=True)
+    pdfs, images = [], []
+    for pages in pdf_pages:
+        path = os.path.join(out_dir, f"paper_{pages}p.pdf")
+        if not os.path.exists(path):
+            make_pdf(path, pages, seed + pages)
+        pdfs.append(path)
+    for name, size in IMAGES:
+        path = os.path.join(out_dir, name)
+        if not os.path.exists(path):
+            make_image(path, size, seed)
+        images.append(path)
+    return pdfs, images
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Erzeugt synthetische PDFs & Bilder für die Benchmarks")
+    parser.add_argument("out_dir")
+    parser.add_argument("--pages", nargs="+", type=int, default=list(PDF_PAGES), help="Seitenzahlen der PDFs")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    pdfs, images = generate(args.out_dir, args.pages, args.seed)
+    for path in pdfs + images:
+        print(f"{path}  {os.path.getsize(path) / 1024:.0f} KB")
+
+
+if __name__ == "__main__":
+    main()
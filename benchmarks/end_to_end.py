@@ -0,0 +1,163 @@
+# End-to-End Benchmark ohne OpenAI-Kosten: misst die Funktionen der Programme gegen den lokalen Mock-Server
+# (mock_openai.py) und einen synthetischen Korpus (corpus.py).
+#
+# Gemessen werden (jeweils Median über --repeat Läufe, die Caches werden vor jedem Lauf geleert):
+# - open_pdf               PDF_Summary_Streamlit.py, Extraktion ohne Literaturverzeichnis
+# - get_all_text_from_pdf  openai_clone_v4.py
+# - encode_image           openai_clone_v4.py, Verkleinern & Kodieren für die Vision-API
+# - create_summary         PDF_Summary_Streamlit.py, inkl. Map-Reduce bei langen Dokumenten
+# - call_openai_api        openai_clone_v4.py, Frage zum PDF bzw. Bild bis zum letzten Token (plus Zeit bis zum ersten Token)
+#
+# Aufruf: python benchmarks/end_to_end.py [--repeat 3] [--json results.json] [--thresholds benchmarks/thresholds.json]
+# Liegt ein Messwert über seinem Grenzwert in thresholds.json, endet das Programm mit Exit-Code 1.
+# Die Grenzwerte gelten für die Default-Einstellungen des Mock-Servers (--latency, --tokens-per-second).
+
+import os
+import sys
+import json
+import time
+import argparse
+import statistics
+import tempfile
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCHMARK_DIR))
+
+import corpus
+import mock_openai
+
+
+class BenchmarkFile:
+    # Ersatz für Streamlits UploadedFile
+    def __init__(self, path):
+        self.name = os.path.basename(path)
+        with open(path, "rb") as f:
+            self._data = f.read()
+
+    def getvalue(self):
+        return self._data
+
+
+def measure(fn, repeat, before=None):
+    # Median & Minimum der Laufzeit; 'before' läuft vor jeder Messung (z.B. Caches leeren)
+    timings = []
+    for _ in range(repeat):
+        if before:
+            before()
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return {"seconds": statistics.median(timings), "min_seconds": min(timings)}
+
+
+def ask(v4, uploaded_file, question):
+    # Eine Chat-Runde in openai_clone_v4.py ohne Oberfläche; Rückgabe: Zeit bis zum ersten Token
+    st = v4.st
+    st.session_state.chat_history = []
+    st.session_state.chat_context = v4.chat_context.new_state()
+    st.session_state.documents = {}
+    st.session_state.upload_owner = v4.upload_store.Owner()
+    doc_hash = v4.add_document(uploaded_file.name, uploaded_file.getvalue())
+    start = time.perf_counter()
+    first_token = None
+    for _ in v4.call_openai_api(question):
+        if first_token is None:
+            first_token = time.perf_counter() - start
+    v4.remove_document(doc_hash)
+    return first_token
+
+
+def run(args):
+    pdf_paths, image_paths = corpus.generate(args.corpus)
+
+    # Programme gegen den Mock-Server laufen lassen, ohne die Caches des Benutzers zu verwenden
+    # und ohne Rate-Limit (der Mock-Server hat kein Kontingent)
+    server, base_url = mock_openai.start_server(latency=args.latency, tokens_per_second=args.tokens_per_second,
+                                                completion_tokens=args.completion_tokens)
+    work_dir = tempfile.mkdtemp(prefix="pdf_summary_benchmark_")
+    os.environ.update(OPENAI_BASE_URL=base_url, OPENAI_API_KEY="mock", LLM_CACHE_MAX_MB="0", OPENAI_RPM="0", OPENAI_TPM="0",
+                      METADATA_CACHE_DB=os.path.join(work_dir, "metadata.sqlite3"),
+                      SUMMARY_JOBS_DB=os.path.join(work_dir, "jobs.sqlite3"))
+    os.environ.pop("PDF_CACHE_DIR", None)
+
+    import pdf_cache
+    import image_pipeline
+    import PDF_Summary_Streamlit as summary_app
+    import openai_clone_v4 as v4
+
+    results = []
+
+    def record(name, case, measurement):
+        results.append({"benchmark": name, "case": case, **measurement})
+        extra = f"  erstes Token {measurement['first_token_seconds']:.3f}s" if "first_token_seconds" in measurement else ""
+        print(f"{name:<22} {case:<20} {measurement['seconds']:>8.3f}s{extra}")
+
+    for path in pdf_paths:
+        pdf_file = BenchmarkFile(path)
+        record("open_pdf", pdf_file.name, measure(lambda: summary_app.open_pdf(pdf_file), args.repeat, pdf_cache.clear))
+        record("get_all_text_from_pdf", pdf_file.name,
+               measure(lambda: v4.get_all_text_from_pdf(pdf_file.getvalue()), args.repeat, pdf_cache.clear))
+
+        _, pages = summary_app.pdf_pages(pdf_file)
+        full_text = "\n\n".join(pages)
+        record("create_summary", pdf_file.name, measure(lambda: summary_app.create_summary(full_text, pages), args.repeat))
+
+        first_tokens = []
+        measurement = measure(lambda: first_tokens.append(ask(v4, pdf_file, "Welche Ergebnisse zur Latenz werden berichtet?")),
+                              args.repeat, pdf_cache.clear)
+        record("call_openai_api", pdf_file.name, {**measurement, "first_token_seconds": statistics.median(first_tokens)})
+
+    for path in image_paths:
+        image_file = BenchmarkFile(path)
+        record("encode_image", image_file.name, measure(lambda: v4.encode_image(image_file.getvalue()), args.repeat, image_pipeline.clear))
+        first_tokens = []
+        measurement = measure(lambda: first_tokens.append(ask(v4, image_file, "Was ist auf dem Bild zu sehen?")),
+                              args.repeat, image_pipeline.clear)
+        record("call_openai_api", image_file.name, {**measurement, "first_token_seconds": statistics.median(first_tokens)})
+
+    server.shutdown()
+    return results
+
+
+def check_thresholds(results, thresholds):
+    # Grenzwerte je Benchmark: {"open_pdf": {"paper_8p.pdf": 0.5, "*": 2.0}, ...}; "*" gilt für alle übrigen Fälle
+    failures = []
+    for result in results:
+        limits = thresholds.get(result["benchmark"], {})
+        limit = limits.get(result["case"], limits.get("*"))
+        if limit is not None and result["seconds"] > limit:
+            failures.append(f"{result['benchmark']} [{result['case']}]: {result['seconds']:.3f}s > Grenzwert {limit}s")
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description="End-to-End Benchmark gegen einen lokalen OpenAI Mock-Server")
+    parser.add_argument("--corpus", default=os.path.join(tempfile.gettempdir(), "pdf_summary_benchmark_corpus"),
+                        help="Verzeichnis für den synthetischen Korpus (wird bei Bedarf erzeugt)")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--latency", type=float, default=0.3, help="Mock-Server: Sekunden bis zum ersten Token")
+    parser.add_argument("--tokens-per-second", type=float, default=50.0, help="Mock-Server: Token-Rate")
+    parser.add_argument("--completion-tokens", type=int, default=120, help="Mock-Server: Länge jeder Antwort")
+    parser.add_argument("--json", help="Ergebnisse als JSON-Datei speichern")
+    parser.add_argument("--thresholds", default=os.path.join(BENCHMARK_DIR, "thresholds.json"), help="Grenzwerte (leer = keine Prüfung)")
+    args = parser.parse_args()
+
+    results = run(args)
+
+    failures = []
+    if args.thresholds:
+        with open(args.thresholds, encoding="utf-8") as f:
+            failures = check_thresholds(results, json.load(f))
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"settings": {"repeat": args.repeat, "latency": args.latency, "tokens_per_second": args.tokens_per_second,
+                                    "completion_tokens": args.completion_tokens},
+                       "results": results, "failures": failures}, f, indent=2)
+
+    for failure in failures:
+        print(f"REGRESSION: {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+# Benchmark der PDF-Backends aus pdf_extraction.py: Durchsatz (Seiten/s) und maximaler Speicherbedarf
+#
+# Aufruf: python benchmarks/extraction.py paper1.pdf paper2.pdf [--backends pypdf pymupdf] [--workers 1 4] [--repeat 3]
+#
+# Jede Kombination aus Datei, Backend & Anzahl Worker läuft in einem eigenen Python-Prozess, damit der
+# gemessene Speicher-Peak (maxrss, inkl. Worker-Prozesse) nicht von vorherigen Läufen verfälscht wird.
+
+import os
+import sys
+import json
+import time
+import argparse
+import resource
+import subprocess
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import pdf_extraction
+
+
+def run_single(path, backend, workers, repeat):
+    # Wird im Kind-Prozess ausgeführt und gibt das Ergebnis als JSON aus
+    with open(path, "rb") as f:
+        pdf_bytes = f.read()
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        pages = pdf_extraction.extract_pages(pdf_bytes, backend, workers=workers)
+        timings.append(time.perf_counter() - start)
+    # ru_maxrss ist unter Linux in KB, unter macOS in Bytes angegeben
+    factor = 1 if sys.platform == "darwin" else 1024
+    peak = max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss, resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss) * factor
+    print(json.dumps({
+        "file": os.path.basename(path),
+        "backend": backend,
+        "workers": workers,
+        "pages": len(pages),
+        "chars": sum(len(page) for page in pages),
+        "seconds": min(timings),
+        "pages_per_second": len(pages) / min(timings) if min(timings) else 0.0,
+        "peak_memory_mb": peak / 1024 / 1024,
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Vergleicht die PDF-Backends nach Durchsatz und Speicherbedarf")
+    parser.add_argument("files", nargs="+", help="PDF-Dateien")
+    parser.add_argument("--backends", nargs="+", default=list(pdf_extraction.BACKENDS), choices=pdf_extraction.BACKENDS)
+    parser.add_argument("--workers", nargs="+", type=int, default=[1, pdf_extraction.MAX_WORKERS])
+    parser.add_argument("--repeat", type=int, default=3, help="Wiederholungen je Messung, gewertet wird der schnellste Lauf")
+    parser.add_argument("--json", help="Ergebnisse zusätzlich als JSON-Datei speichern")
+    parser.add_argument("--single", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.single:
+        run_single(args.files[0], args.backends[0], args.workers[0], args.repeat)
+        return
+
+    results = []
+    print(f"{'Datei':<30} {'Backend':<15} {'Worker':>6} {'Seiten':>7} {'Seiten/s':>10} {'Peak MB':>9}")
+    for path in args.files:
+        for backend in args.backends:
+            for workers in sorted(set(args.workers)):
+                output = subprocess.run(
+                    [sys.executable, __file__, path, "--single", "--backends", backend, "--workers", str(workers), "--repeat", str(args.repeat)],
+                    capture_output=True, text=True, check=True,
+                ).stdout
+                result = json.loads(output.strip().splitlines()[-1])
+                results.append(result)
+                print(f"{result['file'][:30]:<30} {backend:<15} {workers:>6} {result['pages']:>7} {result['pages_per_second']:>10.1f} {result['peak_memory_mb']:>9.1f}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+# Lokaler Ersatz für die OpenAI API (nur POST /v1/chat/completions), damit Benchmarks ohne Kosten & Netzwerk laufen
+# Latenz bis zum ersten Token und Token-Rate sind einstellbar; 'stream=True' wird als Server-Sent Events beantwortet,
+# 'response_format' json_object mit einem passenden JSON-Objekt.
+#
+# Eigenständig:  python benchmarks/mock_openai.py --port 8765 --latency 0.5 --tokens-per-second 60
+#                OPENAI_BASE_URL=http://127.0.0.1:8765/v1 OPENAI_API_KEY=mock streamlit run PDF_Summary_Streamlit.py
+# Im Benchmark:  server, base_url = start_server(latency=0.5, tokens_per_second=60)
+
+import sys
+import json
+import time
+import argparse
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+# Antworttext: Wörter werden als je ein Token gezählt
+_WORDS = ("Die Autoren untersuchen den Einfluss von Zwischenspeichern auf die Antwortzeit verteilter Systeme "
+          "und zeigen in mehreren Experimenten eine deutliche Verbesserung").split()
+
+
+class MockOpenAIHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1" # Keep-Alive wie bei der echten API
+
+    def log_message(self, format, *args):
+        pass # keine Zeile pro Anfrage
+
+    def do_POST(self):
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self.send_error(404)
+            return
+        request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        config = self.server.config
+        self.server.requests += 1
+
+        if (request.get("response_format") or {}).get("type") == "json_object":
+            tokens = [json.dumps({"title": "Synthetic Benchmark Article", "autor": "Erika Mustermann"})]
+        else:
+            tokens = [_WORDS[i % len(_WORDS)] + " " for i in range(config["completion_tokens"])]
+        prompt_tokens = sum(len(str(message.get("content", ""))) for message in request.get("messages", [])) // 4
+        usage = {"prompt_tokens": prompt_tokens, "completion_tokens": len(tokens), "total_tokens": prompt_tokens + len(tokens)}
+        base = {"id": f"chatcmpl-mock-{self.server.requests}", "created": int(time.time()), "model": request.get("model", "mock")}
+
+        time.sleep(config["latency"])
+        if request.get("stream"):
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            for token in tokens:
+                time.sleep(1 / config["tokens_per_second"])
+                self._send_event({**base, "object": "chat.completion.chunk",
+                                  "choices": [{"index": 0, "delta": {"content": token}, "finish_reason": None}]})
+            self._send_event({**base, "object": "chat.completion.chunk", "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]})
+            if (request.get("stream_options") or {}).get("include_usage"):
+                # wie bei OpenAI: ein letzter Chunk ohne 'choices' mit dem Token-Verbrauch
+                self._send_event({**base, "object": "chat.completion.chunk", "choices": [], "usage": usage})
+            self._write_chunk(b"data: [DONE]\n\n")
+            self._write_chunk(b"")
+            return
+
+        time.sleep(len(tokens) / config["tokens_per_second"])
+        body = json.dumps({**base, "object": "chat.completion", "usage": usage, "choices": [
+            {"index": 0, "message": {"role": "assistant", "content": "".join(tokens).strip()}, "finish_reason": "stop"}]}).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_event(self, data):
+        self._write_chunk(f"data: {json.dumps(data)}\n\n".encode("utf-8"))
+
+    def _write_chunk(self, data):
+        self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+        self.wfile.flush()
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # Vom Client geschlossene Keep-Alive Verbindungen sind kein Fehler
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+
+def start_server(port=0, latency=0.3, tokens_per_second=50.0, completion_tokens=120):
+    """Startet den Server in einem Hintergrund-Thread; Rückgabe: (Server, Basis-URL für OPENAI_BASE_URL)"""
+    server = _Server(("127.0.0.1", port), MockOpenAIHandler)
+    server.config = {"latency": latency, "tokens_per_second": tokens_per_second, "completion_tokens": completion_tokens}
+    server.requests = 0
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/v1"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="OpenAI-kompatibler Mock-Server für Benchmarks")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.3, help="Sekunden bis zum ersten Token")
+    parser.add_argument("--tokens-per-second", type=float, default=50.0)
+    parser.add_argument("--completion-tokens", type=int, default=120, help="Länge jeder Antwort in Tokens")
+    args = parser.parse_args()
+
+    server, base_url = start_server(args.port, args.latency, args.tokens_per_second, args.completion_tokens)
+    print(f"Mock OpenAI API läuft unter {base_url} - Beenden mit Ctrl-C")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+# Startzeit der Programme: Import-Zeit und Zeit bis zur ersten Anzeige
+# - Import:         Laden des Programms als Modul (ohne main()), abzüglich des Imports von Streamlit selbst
+# - Erste Anzeige:  erster vollständiger Skriptlauf ohne Upload in Streamlits AppTest, inkl. aller Importe
+#                   (genau das sieht ein Benutzer beim Öffnen der Seite)
+# Jede Messung läuft in einem frischen Python-Prozess, damit bereits geladene Module nichts verfälschen.
+# Das Vorwärmen im Hintergrund (prewarm.py) ist dabei abgeschaltet.
+#
+# Aufruf: python benchmarks/startup.py [--scripts PDF_Summary_Streamlit.py openai_clone_v4.py] [--repeat 3] [--json startup.json]
+
+import os
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCRIPTS = ("PDF_Summary_Streamlit.py", "openai_clone_v1.py", "openai_clone_v2.py", "openai_clone_v3.py", "openai_clone_v4.py")
+
+# Läuft im Kind-Prozess; gibt die Messwerte als JSON aus
+_MEASURE = """
+import sys, time, json, importlib
+sys.path.insert(0, {repo!r})
+start = time.perf_counter()
+import streamlit
+streamlit_seconds = time.perf_counter() - start
+if {mode!r} == "import":
+    start = time.perf_counter()
+    importlib.import_module({module!r})
+    print(json.dumps({{"streamlit_seconds": streamlit_seconds, "seconds": time.perf_counter() - start}}))
+else:
+    from streamlit.testing.v1 import AppTest
+    start = time.perf_counter()
+    at = AppTest.from_file({path!r}, default_timeout=120).run()
+    if at.exception:
+        raise RuntimeError(at.exception[0].message)
+    print(json.dumps({{"streamlit_seconds": streamlit_seconds, "seconds": time.perf_counter() - start}}))
+"""
+
+
+def measure(script, mode):
+    code = _MEASURE.format(repo=REPO_DIR, mode=mode, module=script[:-3], path=os.path.join(REPO_DIR, script))
+    env = {**os.environ, "PREWARM": "0", "OPENAI_API_KEY": os.environ.get("OPENAI_API_KEY", "startup-benchmark")}
+    completed = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, cwd=REPO_DIR, env=env)
+    if completed.returncode != 0:
+        raise RuntimeError(completed.stderr.strip().splitlines()[-1] if completed.stderr.strip() else f"Exit-Code {completed.returncode}")
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Misst Import-Zeit und Zeit bis zur ersten Anzeige je Programm")
+    parser.add_argument("--scripts", nargs="+", default=list(SCRIPTS))
+    parser.add_argument("--repeat", type=int, default=3, help="Wiederholungen je Messung, gewertet wird der Median")
+    parser.add_argument("--json", help="Ergebnisse zusätzlich als JSON-Datei speichern")
+    args = parser.parse_args()
+
+    results = []
+    print(f"{'Programm':<28} {'Import':>9} {'Erste Anzeige':>14} {'(Streamlit)':>12}")
+    for script in args.scripts:
+        try:
+            imports = [measure(script, "import") for _ in range(args.repeat)]
+            first_paint = [measure(script, "first_paint") for _ in range(args.repeat)]
+        except RuntimeError as e:
+            print(f"{script:<28} Fehler: {e}")
+            results.append({"script": script, "error": str(e)})
+            continue
+        result = {
+            "script": script,
+            "import_seconds": statistics.median(run["seconds"] for run in imports),
+            "first_paint_seconds": statistics.median(run["seconds"] for run in first_paint),
+            "streamlit_import_seconds": statistics.median(run["streamlit_seconds"] for run in imports),
+        }
+        results.append(result)
+        print(f"{script:<28} {result['import_seconds']:>8.2f}s {result['first_paint_seconds']:>13.2f}s {result['streamlit_import_seconds']:>11.2f}s")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+# Token-Budget für den Gesprächskontext der Chat-Clones (openai_clone_v2-v4.py)
+# Ohne Begrenzung wird bei jeder Runde der komplette Chat-Verlauf mitgeschickt, d.h. Kosten & Latenz
+# wachsen linear mit der Länge des Gesprächs.
+#
+# - Die jüngsten Nachrichten werden wörtlich übernommen, solange sie in CONTEXT_TOKENS passen
+# - Ältere Nachrichten werden zu einer laufenden Zusammenfassung verdichtet. Diese wird inkrementell
+#   fortgeschrieben (nur neu herausfallende Nachrichten werden eingearbeitet) und im Session-State gehalten
+#
+# Konfiguration über Systemvariablen: CHAT_CONTEXT_TOKENS (Default 6000), CHAT_SUMMARY_MODEL (Default gpt-4o-mini)
+
+import os
+
+import openai_client
+from chunked_summary import estimate_tokens
+
+CONTEXT_TOKENS = int(os.getenv("CHAT_CONTEXT_TOKENS", "6000"))
+SUMMARY_MODEL = os.getenv("CHAT_SUMMARY_MODEL", "gpt-4o-mini")
+
+
+def new_state():
+    """Leerer Kontext-Status für den Session-State: laufende Zusammenfassung & Anzahl eingearbeiteter Nachrichten"""
+    return {"summary": "", "summarized_upto": 0}
+
+
+def message_tokens(message):
+    content = message["content"]
+    if isinstance(content, list):
+        # Bei Bildern nur den Textanteil schätzen; die Bildkosten hängen von der Auflösung ab
+        content = " ".join(part.get("text", "") for part in content if part.get("type") == "text")
+    return estimate_tokens(content) + 4 # Overhead für Rolle & Formatierung
+
+
+def summarize_turns(previous_summary, messages):
+    # Bisherige Zusammenfassung um die neu herausgefallenen Nachrichten ergänzen
+    conversation = "\n".join(f"{message['role']}: {message['content']}" for message in messages)
+    prompt = f"""
+    Update the running summary of a conversation between a student and an educational assistant.
+    Keep all facts, questions, answers and open points that may be needed to continue the conversation.
+    Use at most 300 words and write in the language of the conversation.
+
+    Running summary so far:
+    {previous_summary or '(empty)'}
+
+    New messages:
+    {conversation}
+    """
+    response = openai_client.chat_completion(
+        model=SUMMARY_MODEL,
+        temperature=0,
+        messages=[{"role": "user", "content": prompt}],
+    )
+    return response.choices[0].message.content.strip()
+
+
+def build_context(chat_history, state, budget=CONTEXT_TOKENS):
+    """Liefert die Nachrichten für den nächsten Aufruf (Zusammenfassung + jüngste Nachrichten) und aktualisiert 'state'"""
+    # Chat wurde neu gestartet oder gekürzt
+    if state["summarized_upto"] > len(chat_history):
+        state.update(new_state())
+
+    # Von hinten so viele Nachrichten übernehmen, wie in das Budget passen
+    keep_from, tokens = len(chat_history), 0
+    while keep_from > 0 and tokens + message_tokens(chat_history[keep_from - 1]) <= budget:
+        keep_from -= 1
+        tokens += message_tokens(chat_history[keep_from])
+    # Frage & Antwort nicht auseinanderreißen: das Fenster beginnt immer mit einer Nachricht des Users
+    while keep_from < len(chat_history) and chat_history[keep_from]["role"] != "user":
+        keep_from += 1
+
+    # Nur die seit dem letzten Mal herausgefallenen Nachrichten in die Zusammenfassung einarbeiten
+    if keep_from > state["summarized_upto"]:
+        state["summary"] = summarize_turns(state["summary"], chat_history[state["summarized_upto"]:keep_from])
+        state["summarized_upto"] = keep_from
+
+    messages = []
+    if state["summary"]:
+        messages.append({"role": "system", "content": f"Zusammenfassung des bisherigen Gesprächs:\n{state['summary']}"})
+    messages += chat_history[state["summarized_upto"]:]
+    return messages
+
+
+def context_info(messages, summarized_count):
+    """Kurzer Text zur Anzeige in der UI: geschätzte Eingabegröße der aktuellen Runde"""
+    tokens = sum(message_tokens(message) for message in messages)
+    text = f"Eingabe dieser Runde: ca. {tokens:,} Tokens".replace(",", ".")
+    if summarized_count:
+        text += f" ({summarized_count} ältere Nachrichten zusammengefasst)"
+    return text
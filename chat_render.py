@@ -0,0 +1,57 @@
+# Darstellung des Chat-Verlaufs für openai_clone_v3.py & openai_clone_v4.py
+# - Jede Nachricht wird nur einmal in HTML umgewandelt; die Fragmente liegen im Session-State
+# - Angezeigt werden nur die neuesten HISTORY_PAGE_SIZE Nachrichten, ältere erst auf Wunsch ("Ältere laden")
+# Damit wächst der Aufwand eines Reruns nicht mehr mit der Länge des Gesprächs.
+
+import streamlit as st
+
+import instrumentation
+
+HISTORY_PAGE_SIZE = 20
+
+USER_STYLE = "text-align: right; color: green; margin-bottom: 10px;"
+ASSISTANT_STYLE = "text-align: left; margin-bottom: 10px;"
+
+
+def render_message(entry):
+    style = USER_STYLE if entry['role'] == 'user' else ASSISTANT_STYLE
+    return f"<div style='{style}'>{entry['content']}</div><br>\n"
+
+
+def _fragment(cache, index, entry):
+    # Die Nachricht an Position 'index' ist unverändert, solange ihr Inhalt dasselbe Objekt ist
+    cached = cache.get(index)
+    if cached is None or cached[0] is not entry['content']:
+        cached = (entry['content'], render_message(entry))
+        cache[index] = cached
+    return cached[1]
+
+
+def show_chat_history(chat_history):
+    """Zeigt die neuesten Nachrichten (neueste oben) in einem scrollbaren Container an"""
+    if 'history_fragments' not in st.session_state:
+        st.session_state.history_fragments = {}
+    if 'history_visible' not in st.session_state:
+        st.session_state.history_visible = HISTORY_PAGE_SIZE
+
+    cache = st.session_state.history_fragments
+    first_visible = max(0, len(chat_history) - st.session_state.history_visible)
+    with instrumentation.span("history.render", messages=len(chat_history) - first_visible):
+        chat_history_text = "".join(_fragment(cache, index, chat_history[index])
+                                    for index in range(len(chat_history) - 1, first_visible - 1, -1))
+
+    # Display chat history with HTML formatting inside a scrollable container
+    st.markdown(f"<div style='height: calc(100vh - 150px); overflow-y: scroll; padding-right: 10px;'>{chat_history_text}</div>", unsafe_allow_html=True)
+
+    if first_visible > 0:
+        st.button(f"Ältere Nachrichten laden ({first_visible} weitere)", on_click=_show_older)
+
+
+def _show_older():
+    st.session_state.history_visible += HISTORY_PAGE_SIZE
+
+
+def reset_chat_history_view():
+    """Beim Start eines neuen Chats aufrufen"""
+    st.session_state.history_fragments = {}
+    st.session_state.history_visible = HISTORY_PAGE_SIZE
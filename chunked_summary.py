@@ -0,0 +1,64 @@
+# Map-Reduce Zusammenfassung für lange Dokumente
+# Die Seiten eines PDFs werden zu Abschnitten mit begrenzter Token-Anzahl gruppiert (Grenzen = Seitengrenzen),
+# jeder Abschnitt wird parallel mit begrenzter Anzahl gleichzeitiger Aufrufe zusammengefasst ("map"),
+# anschließend erstellt der Aufrufer aus den Teilzusammenfassungen die finale Zusammenfassung ("reduce").
+
+from concurrent.futures import ThreadPoolExecutor
+
+import instrumentation
+
+CHARS_PER_TOKEN = 4  # grobe Schätzung für englische/deutsche Texte, reicht für die Budgetierung
+
+
+def estimate_tokens(text):
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def _split_page(text, max_tokens):
+    # Eine einzelne Seite, die das Budget sprengt, an Absatzgrenzen (notfalls hart) aufteilen
+    max_chars = max_tokens * CHARS_PER_TOKEN
+    parts, current = [], ""
+    for paragraph in text.split("\n\n"):
+        while len(paragraph) > max_chars:
+            if current:
+                parts.append(current)
+                current = ""
+            parts.append(paragraph[:max_chars])
+            paragraph = paragraph[max_chars:]
+        if current and len(current) + len(paragraph) + 2 > max_chars:
+            parts.append(current)
+            current = ""
+        current = f"{current}\n\n{paragraph}" if current else paragraph
+    if current:
+        parts.append(current)
+    return parts
+
+
+def chunk_pages(pages, max_tokens):
+    """Gruppiert aufeinanderfolgende Seiten zu Abschnitten: Liste von (erste Seite, letzte Seite, Text), Seiten ab 1"""
+    chunks = []
+    first, texts, tokens = None, [], 0
+    for page_num, text in enumerate(pages, start=1):
+        page_tokens = estimate_tokens(text)
+        if texts and tokens + page_tokens > max_tokens:
+            chunks.append((first, page_num - 1, "\n\n".join(texts)))
+            first, texts, tokens = None, [], 0
+
+        if page_tokens > max_tokens:
+            chunks.extend((page_num, page_num, part) for part in _split_page(text, max_tokens))
+            continue
+
+        if first is None:
+            first = page_num
+        texts.append(text)
+        tokens += page_tokens
+
+    if texts:
+        chunks.append((first, len(pages), "\n\n".join(texts)))
+    return chunks
+
+
+def map_chunks(chunks, summarize_fn, max_workers=4):
+    """Ruft 'summarize_fn(text, erste Seite, letzte Seite)' parallel für alle Abschnitte auf; Reihenfolge bleibt erhalten"""
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        return list(executor.map(instrumentation.bind(lambda chunk: summarize_fn(chunk[2], chunk[0], chunk[1])), chunks))
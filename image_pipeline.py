@@ -0,0 +1,98 @@
+# Aufbereitung hochgeladener Bilder vor dem Aufruf der Vision-Modelle (openai_clone_v1-v4.py)
+# - Bilder werden auf IMAGE_MAX_EDGE Pixel (längste Kante) bzw. 768 Pixel (kürzeste Kante) verkleinert; genau so
+#   skaliert die OpenAI API selbst im 'high detail' Modus, größere Bilder kosten also nur Upload-Zeit bei jeder Chat-Runde
+# - Neu kodiert wird als JPEG (Qualität IMAGE_JPEG_QUALITY) bzw. als PNG bei Transparenz, mit passendem MIME-Typ
+# - Das fertige base64-Payload wird pro Bild-Hash zwischengespeichert, Folgefragen kosten keine Rechenzeit mehr;
+#   die Anzeige im Chat nutzt dieselben verkleinerten Bytes ('display_image') statt des Originals
+#
+# Konfiguration über Systemvariablen: IMAGE_MAX_EDGE (Default 2048), IMAGE_JPEG_QUALITY (Default 85)
+
+import io
+import os
+import base64
+import threading
+from collections import OrderedDict
+
+import pdf_cache
+import instrumentation
+
+MAX_EDGE = int(os.getenv("IMAGE_MAX_EDGE", "2048"))
+JPEG_QUALITY = int(os.getenv("IMAGE_JPEG_QUALITY", "85"))
+SHORT_EDGE = 768 # kürzeste Kante nach der Skalierung durch die OpenAI API
+CACHE_SIZE = 32
+
+# Formate, die die OpenAI API direkt annimmt
+_MIME_TYPES = {"JPEG": "image/jpeg", "PNG": "image/png", "WEBP": "image/webp", "GIF": "image/gif"}
+
+_lock = threading.Lock()
+_payloads = OrderedDict()
+
+
+def _has_alpha(image):
+    return image.mode in ("RGBA", "LA") or (image.mode == "P" and "transparency" in image.info)
+
+
+def prepare_image(data, max_edge=MAX_EDGE, quality=JPEG_QUALITY):
+    """Liefert (MIME-Typ, Bild-Bytes): verkleinert & neu kodiert, oder das Original, wenn das nichts bringt"""
+    from PIL import Image, ImageOps  # Pillow erst beim ersten Bild laden
+    image = Image.open(io.BytesIO(data))
+    source_format = image.format
+    scale = min(1.0, max_edge / max(image.size), SHORT_EDGE / min(image.size))
+    needs_resize = scale < 1.0
+
+    # Kleine Bilder in einem unterstützten Format unverändert übernehmen (kein Qualitätsverlust)
+    if not needs_resize and source_format in _MIME_TYPES:
+        return _MIME_TYPES[source_format], data
+
+    image = ImageOps.exif_transpose(image) # Drehung laut EXIF übernehmen, die Metadaten gehen beim Neukodieren verloren
+    if needs_resize:
+        image = image.resize((max(1, round(image.width * scale)), max(1, round(image.height * scale))), Image.LANCZOS)
+
+    buffer = io.BytesIO()
+    if _has_alpha(image):
+        image.save(buffer, format="PNG", optimize=True)
+        mime_type = "image/png"
+    else:
+        image.convert("RGB").save(buffer, format="JPEG", quality=quality, optimize=True)
+        mime_type = "image/jpeg"
+
+    # Nur verwenden, wenn das Ergebnis tatsächlich kleiner ist (oder das Original nicht unterstützt wird)
+    if source_format in _MIME_TYPES and not needs_resize and buffer.tell() >= len(data):
+        return _MIME_TYPES[source_format], data
+    return mime_type, buffer.getvalue()
+
+
+def _prepared(data, doc_hash=None):
+    # (MIME-Typ, Bild-Bytes, data URL) aus dem Cache bzw. einmal berechnen; mit bekanntem 'doc_hash' ohne erneutes Hashen
+    key = (doc_hash or pdf_cache.document_hash(data), MAX_EDGE, JPEG_QUALITY)
+    with _lock:
+        if key in _payloads:
+            _payloads.move_to_end(key)
+            return _payloads[key]
+
+    with instrumentation.span("image.encode", kb_in=len(data) // 1024) as attributes:
+        mime_type, image_bytes = prepare_image(data)
+        attributes["kb_out"] = len(image_bytes) // 1024
+    data_url = f"data:{mime_type};base64,{base64.b64encode(image_bytes).decode('utf-8')}"
+    print(f"Bild aufbereitet: {len(data) / 1024:.0f} KB -> {len(image_bytes) / 1024:.0f} KB ({mime_type})")
+
+    with _lock:
+        _payloads[key] = (mime_type, bytes(image_bytes), data_url)
+        while len(_payloads) > CACHE_SIZE:
+            _payloads.popitem(last=False)
+        return _payloads[key]
+
+
+def image_data_url(data, doc_hash=None):
+    """Bild als 'data:<MIME-Typ>;base64,...' URL für die OpenAI API - pro Bild nur einmal berechnet"""
+    return _prepared(data, doc_hash)[2]
+
+
+def display_image(data, doc_hash=None):
+    """Verkleinerte Bild-Bytes für die Anzeige (st.image) - dieselben wie für die API, statt des Originals"""
+    return _prepared(data, doc_hash)[1]
+
+
+def clear():
+    with _lock:
+        _payloads.clear()
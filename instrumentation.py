@@ -0,0 +1,175 @@
+# Optionale Laufzeit-Messung der langsamen Stellen (PDF-Extraktion, Bild-Kodierung, Vorschaubilder,
+# Chat-Verlauf, Suchindex, OpenAI-Aufrufe) und der verbrauchten Tokens je Aufruf.
+# Eingeschaltet über die Systemvariable PERF_INSTRUMENTATION=1; ausgeschaltet kostet ein 'span' praktisch nichts.
+#
+# - Seitenleiste: 'show_panel()' zeigt die Messungen des letzten Reruns (PDF_Summary_Streamlit.py, openai_clone_v4.py)
+# - PERF_LOG_FILE:     jede Messung als JSON-Zeile anhängen ('-' = Terminal)
+# - PERF_METRICS_FILE: Summen seit Programmstart & aktuelle Werte (Gauges) im Prometheus-Textformat, nach jedem Rerun neu geschrieben
+#
+# Messungen aus Thread-Pools werden dem Rerun nur zugeordnet, wenn die Funktion mit 'bind' übergeben wird.
+# 'bind' gibt auch die Streamlit-Session ('session_id', z.B. für den Round Robin in rate_limiter.py) weiter.
+
+import os
+import json
+import time
+import threading
+import functools
+import contextvars
+from contextlib import contextmanager
+
+ENABLED = os.getenv("PERF_INSTRUMENTATION", "0").lower() in ("1", "true", "yes", "on")
+LOG_FILE = os.getenv("PERF_LOG_FILE")
+METRICS_FILE = os.getenv("PERF_METRICS_FILE")
+
+_current_run = contextvars.ContextVar("perf_run", default=None)
+_session = contextvars.ContextVar("streamlit_session", default=None)
+_lock = threading.Lock()
+_totals = {} # Span-Name -> [Anzahl, Sekunden]
+_tokens = {} # Modell -> [Prompt-Tokens, Completion-Tokens, Aufrufe]
+_gauges = {} # (Name, Labels) -> aktueller Wert, z.B. Länge der Warteschlange im rate_limiter
+
+
+@contextmanager
+def _noop():
+    yield {}
+
+
+@contextmanager
+def _span(name, attributes):
+    start = time.perf_counter()
+    try:
+        yield attributes # der Aufrufer kann während der Messung weitere Attribute ergänzen
+    finally:
+        _record({"span": name, "seconds": time.perf_counter() - start, "time": time.time(), **attributes})
+
+
+def span(name, **attributes):
+    """Kontextmanager, der die Dauer des Blocks unter 'name' (z.B. 'pdf.extract') festhält"""
+    return _span(name, attributes) if ENABLED else _noop()
+
+
+def _record(entry):
+    run = _current_run.get()
+    if run is not None:
+        run.append(entry)
+    with _lock:
+        count_seconds = _totals.setdefault(entry["span"], [0, 0.0])
+        count_seconds[0] += 1
+        count_seconds[1] += entry["seconds"]
+        if LOG_FILE:
+            line = json.dumps(entry, ensure_ascii=False, default=str)
+            if LOG_FILE == "-":
+                print(line)
+            else:
+                with open(LOG_FILE, "a", encoding="utf-8") as f:
+                    f.write(line + "\n")
+
+
+def record_usage(model, usage):
+    """Token-Verbrauch eines OpenAI-Aufrufs (Objekt mit prompt_tokens & completion_tokens)"""
+    if not ENABLED or usage is None:
+        return
+    entry = {"span": "openai.usage", "seconds": 0.0, "time": time.time(), "model": model,
+             "prompt_tokens": usage.prompt_tokens or 0, "completion_tokens": usage.completion_tokens or 0}
+    with _lock:
+        tokens = _tokens.setdefault(model, [0, 0, 0])
+        tokens[0] += entry["prompt_tokens"]
+        tokens[1] += entry["completion_tokens"]
+        tokens[2] += 1
+    _record(entry)
+
+
+def set_gauge(name, value, **labels):
+    """Aktueller Wert einer Messgröße (z.B. Länge einer Warteschlange), erscheint in PERF_METRICS_FILE"""
+    if not ENABLED:
+        return
+    with _lock:
+        _gauges[(name, tuple(sorted(labels.items())))] = value
+
+
+def session_id():
+    """Streamlit-Session des Aufrufers ('anonym' außerhalb von Streamlit); in Thread-Pools nur über 'bind' bekannt"""
+    session = _session.get()
+    if session is None:
+        from streamlit.runtime.scriptrunner import get_script_run_ctx
+        ctx = get_script_run_ctx(suppress_warning=True)
+        session = ctx.session_id if ctx is not None else "anonym"
+        _session.set(session) # im Kontext ablegen, damit 'bind' sie weitergibt
+    return session
+
+
+def bind(fn):
+    """Funktion für einen Thread-Pool: ihre Messungen zählen zum aktuellen Rerun, ihre OpenAI Aufrufe zur Session"""
+    session_id()
+    context = contextvars.copy_context()
+    # Jeder Aufruf bekommt eine eigene Kopie: ein Kontext kann nicht in mehreren Threads gleichzeitig laufen
+    return lambda *args, **kwargs: context.copy().run(fn, *args, **kwargs)
+
+
+def start_run():
+    """Zu Beginn eines Streamlit-Reruns aufrufen"""
+    if ENABLED:
+        _current_run.set([])
+
+
+def _write_metrics():
+    lines = ["# TYPE pdf_summary_span_seconds_total counter", "# TYPE pdf_summary_span_count_total counter"]
+    with _lock:
+        for name, (count, seconds) in sorted(_totals.items()):
+            lines.append(f'pdf_summary_span_seconds_total{{span="{name}"}} {seconds:.6f}')
+            lines.append(f'pdf_summary_span_count_total{{span="{name}"}} {count}')
+        lines.append("# TYPE pdf_summary_tokens_total counter")
+        for model, (prompt_tokens, completion_tokens, _) in sorted(_tokens.items()):
+            lines.append(f'pdf_summary_tokens_total{{model="{model}",type="prompt"}} {prompt_tokens}')
+            lines.append(f'pdf_summary_tokens_total{{model="{model}",type="completion"}} {completion_tokens}')
+        for name in sorted({name for name, _ in _gauges}):
+            lines.append(f"# TYPE pdf_summary_{name} gauge")
+            for (gauge, labels), value in sorted(_gauges.items()):
+                if gauge == name:
+                    label_text = ",".join(f'{key}="{label}"' for key, label in labels)
+                    lines.append(f"pdf_summary_{name}{{{label_text}}} {value}")
+    tmp_path = f"{METRICS_FILE}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write("\n".join(lines) + "\n")
+    os.replace(tmp_path, METRICS_FILE) # Prometheus node_exporter liest nie eine halb geschriebene Datei
+
+
+def instrumented_run(main):
+    """Decorator für die main()-Funktion einer Streamlit-App: Messungen je Rerun sammeln & anzeigen"""
+    @functools.wraps(main)
+    def run(*args, **kwargs):
+        start_run()
+        result = main(*args, **kwargs)
+        show_panel()
+        return result
+    return run
+
+
+def show_panel():
+    """Am Ende eines Reruns aufrufen: Aufschlüsselung in der Seitenleiste, Metrik-Datei aktualisieren"""
+    if not ENABLED:
+        return
+    if METRICS_FILE:
+        _write_metrics()
+
+    import streamlit as st
+    run = _current_run.get() or []
+    with st.sidebar.expander("Performance (letzter Rerun)", expanded=True):
+        spans = [entry for entry in run if entry["span"] != "openai.usage"]
+        if spans:
+            st.caption(f"Gesamt gemessen: {sum(entry['seconds'] for entry in spans) * 1000:.0f} ms")
+            st.dataframe([{"Stelle": entry["span"], "ms": round(entry["seconds"] * 1000, 1),
+                           "Details": ", ".join(f"{key}={value}" for key, value in entry.items() if key not in ("span", "seconds", "time"))}
+                          for entry in spans], hide_index=True, width="stretch")
+        else:
+            st.caption("Keine Messungen in diesem Rerun")
+        usage = [entry for entry in run if entry["span"] == "openai.usage"]
+        if usage:
+            st.caption("Tokens: " + " | ".join(f"{entry['model']} {entry['prompt_tokens']} + {entry['completion_tokens']}" for entry in usage))
+        with _lock:
+            if _tokens:
+                st.caption("Seit Programmstart: " + " | ".join(f"{model} {prompt} + {completion} Tokens in {calls} Aufrufen"
+                                                               for model, (prompt, completion, calls) in _tokens.items()))
+            if _gauges:
+                st.caption("Aktuell: " + " | ".join(f"{name} {' '.join(str(label) for _, label in labels)} = {value}"
+                                                    for (name, labels), value in sorted(_gauges.items())))
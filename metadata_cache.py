@@ -0,0 +1,51 @@
+# Persistenter Cache für die Metadaten eines PDFs (Titel, Autor, Seitenzahl)
+# Titel und Autor werden per LLM ermittelt; ohne Cache würde jeder Streamlit-Rerun (z.B. Klick auf
+# "Summary erstellen" oder den Download-Button) zwei weitere GPT-4 Turbo Aufrufe kosten.
+#
+# Schlüssel ist der Hash des Dokuments plus die Modell-ID, d.h. ein Modellwechsel erzeugt neue Einträge.
+# Die Einträge liegen in einer SQLite-Datenbank (eine Zeile je Schlüssel), damit mehrere Prozesse - z.B. die
+# Streamlit-App und batch_summary.py - gleichzeitig lesen & schreiben, ohne sich gegenseitig Einträge zu überschreiben.
+# Pfad über die Systemvariable METADATA_CACHE_DB (Default: ~/.cache/pdf_summary/metadata.sqlite3)
+
+import os
+import json
+import sqlite3
+import threading
+
+DB_FILE = os.getenv("METADATA_CACHE_DB") or os.path.join(os.path.expanduser("~"), ".cache", "pdf_summary", "metadata.sqlite3")
+
+_lock = threading.Lock()
+_initialized = False
+
+
+def _connect():
+    global _initialized
+    if not _initialized:
+        os.makedirs(os.path.dirname(DB_FILE) or ".", exist_ok=True)
+    connection = sqlite3.connect(DB_FILE, timeout=30)
+    if not _initialized:
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("CREATE TABLE IF NOT EXISTS metadata (key TEXT PRIMARY KEY, metadata TEXT)")
+        _initialized = True
+    return connection
+
+
+def get(doc_hash, model):
+    """Liefert {'title', 'autor', 'num_pages'} oder None, falls das Dokument noch unbekannt ist"""
+    with _lock:
+        connection = _connect()
+        row = connection.execute("SELECT metadata FROM metadata WHERE key = ?", (f"{doc_hash}:{model}",)).fetchone()
+        connection.close()
+    return json.loads(row[0]) if row else None
+
+
+def put(doc_hash, model, metadata):
+    try:
+        with _lock:
+            connection = _connect()
+            with connection:
+                connection.execute("INSERT INTO metadata (key, metadata) VALUES (?, ?) ON CONFLICT (key) DO UPDATE SET metadata = excluded.metadata",
+                                   (f"{doc_hash}:{model}", json.dumps(metadata, ensure_ascii=False)))
+            connection.close()
+    except sqlite3.Error as e:
+        print(f"Metadaten-Cache konnte nicht geschrieben werden: {e}")
@@ -0,0 +1,182 @@
+# Gemeinsamer OpenAI Client für alle Programme (PDF_Summary_Streamlit.py & openai_clone_v1-v4.py)
+# Statt bei jedem Aufruf einen neuen Client (und damit eine neue TLS-Verbindung) aufzubauen, gibt es genau
+# einen Client pro Prozess, der die HTTP-Verbindungen offen hält (Keep-Alive, Connection-Pool des SDK mit dessen
+# Standardgrößen, openai.DEFAULT_CONNECTION_LIMITS; wie viele Aufrufe gleichzeitig laufen, begrenzt rate_limiter.py).
+# Bei 429 (Rate Limit), 5xx und Verbindungsfehlern wird mit exponentiellem Backoff plus Zufallsanteil wiederholt.
+#
+# Konfiguration über Systemvariablen:
+# - OPENAI_API_KEY:          API-Key (Pflicht)
+# - OPENAI_TIMEOUT:          Timeout je Anfrage in Sekunden, Default 120
+# - OPENAI_MAX_RETRIES:      maximale Anzahl Wiederholungen, Default 4
+#
+# Antworten auf Aufrufe mit temperature=0 kommen beim zweiten Mal aus dem persistenten Cache (response_cache.py);
+# innerhalb von 'with refreshed_cache():' werden sie neu angefragt und im Cache ersetzt.
+# Alle übrigen Aufrufe teilen sich ein prozessweites Rate-Limit pro Modell mit fairer Warteschlange je Session
+# (rate_limiter.py, OPENAI_RPM & OPENAI_TPM).
+
+import os
+import time
+import random
+import contextvars
+from contextlib import contextmanager
+
+# openai wird erst beim ersten Aufruf geladen (allein 'import openai' dauert fast eine Sekunde)
+import streamlit as st
+
+import response_cache
+import rate_limiter
+import instrumentation
+
+TIMEOUT = float(os.getenv("OPENAI_TIMEOUT", "120"))
+MAX_RETRIES = int(os.getenv("OPENAI_MAX_RETRIES", "4"))
+BACKOFF_BASE = 1.0 # Sekunden
+BACKOFF_MAX = 30.0 # Sekunden
+
+_refresh = contextvars.ContextVar("llm_cache_refresh", default=False)
+
+
+def __getattr__(name):
+    # 'openai_client.APIError' für die except-Blöcke der Programme, ohne openai schon beim Start zu laden
+    if name == "APIError":
+        import openai
+        return openai.APIError
+    raise AttributeError(f"module 'openai_client' has no attribute '{name}'")
+
+
+@st.cache_resource
+def get_client():
+    """Prozessweiter OpenAI Client mit Connection-Pool; Wiederholungen übernimmt 'chat_completion'"""
+    import openai
+    return openai.OpenAI(api_key=os.environ.get("OPENAI_API_KEY"), timeout=openai.Timeout(TIMEOUT, connect=10.0), max_retries=0)
+
+
+def _is_retryable(error):
+    import openai
+    if isinstance(error, (openai.APIConnectionError, openai.RateLimitError, openai.InternalServerError)):
+        return True # APITimeoutError ist eine Unterklasse von APIConnectionError
+    return isinstance(error, openai.APIStatusError) and error.status_code >= 500
+
+
+def _retry_delay(error, attempt):
+    # Wenn der Server einen 'Retry-After' Header mitschickt, diesen respektieren
+    response = getattr(error, "response", None)
+    if response is not None:
+        try:
+            return min(float(response.headers.get("retry-after")), BACKOFF_MAX)
+        except (TypeError, ValueError):
+            pass
+    # Exponentieller Backoff mit "full jitter", damit nicht alle Sessions gleichzeitig erneut anfragen
+    return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt))
+
+
+def _create(**kwargs):
+    import openai
+    limiter = rate_limiter.limiter(kwargs.get("model"))
+    tokens = rate_limiter.estimate_request_tokens(kwargs)
+    for attempt in range(MAX_RETRIES + 1):
+        # Auch jede Wiederholung wartet auf das Rate-Limit
+        limiter.acquire(tokens)
+        try:
+            response = get_client().chat.completions.create(**kwargs)
+        except openai.APIError as e:
+            if attempt == MAX_RETRIES or not _is_retryable(e):
+                raise
+            delay = _retry_delay(e, attempt)
+            if isinstance(e, openai.RateLimitError):
+                limiter.pause(delay) # alle Sessions halten an, statt gleichzeitig erneut anzufragen
+            print(f"OpenAI Aufruf fehlgeschlagen ({e.__class__.__name__}), neuer Versuch in {delay:.1f}s")
+            time.sleep(delay)
+            continue
+        if kwargs.get("stream"):
+            return _settle_stream(limiter, tokens, response)
+        if response.usage is not None:
+            limiter.settle(tokens, response.usage.total_tokens)
+        return response
+
+
+def _settle_stream(limiter, tokens, stream):
+    # Bei gestreamten Antworten steht der Verbrauch im letzten Chunk (stream_options include_usage)
+    for chunk in stream:
+        if getattr(chunk, "usage", None):
+            limiter.settle(tokens, chunk.usage.total_tokens)
+        yield chunk
+
+
+def _from_cache(data, stream):
+    from openai.types.chat import ChatCompletion, ChatCompletionChunk
+    # Aus dem Cache entstehen keine Kosten
+    data = {**data, "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0}}
+    if not stream:
+        return ChatCompletion.model_validate(data)
+    choice = data["choices"][0]
+    return iter([ChatCompletionChunk.model_validate({
+        "id": data["id"], "object": "chat.completion.chunk", "created": data["created"], "model": data["model"],
+        "choices": [{"index": 0, "finish_reason": choice["finish_reason"], "delta": {"role": "assistant", "content": choice["message"]["content"]}}],
+    })])
+
+
+def _store_stream(key, stream):
+    # Reicht die Chunks durch und speichert die Antwort, sobald sie vollständig empfangen wurde
+    content, finish_reason, last = [], None, None
+    for chunk in stream:
+        last = chunk
+        if chunk.choices:
+            content.append(chunk.choices[0].delta.content or "")
+            finish_reason = chunk.choices[0].finish_reason or finish_reason
+        yield chunk
+    if last is not None and finish_reason is not None:
+        response_cache.put(key, {"id": last.id, "object": "chat.completion", "created": last.created, "model": last.model,
+                                 "choices": [{"index": 0, "finish_reason": finish_reason, "message": {"role": "assistant", "content": "".join(content)}}]})
+
+
+def _track_usage(model, stream):
+    # Mit stream_options include_usage kommt der Token-Verbrauch im letzten Chunk
+    for chunk in stream:
+        if getattr(chunk, "usage", None):
+            instrumentation.record_usage(model, chunk.usage)
+        yield chunk
+
+
+def _request(**kwargs):
+    # Bei gestreamten Antworten misst der Span die Zeit bis zum Beginn der Antwort
+    with instrumentation.span("openai.request", model=kwargs.get("model"), stream=bool(kwargs.get("stream"))):
+        if kwargs.get("stream"):
+            kwargs.setdefault("stream_options", {"include_usage": True}) # für rate_limiter.settle & die Token-Messung
+        response = _create(**kwargs)
+    if kwargs.get("stream"):
+        return _track_usage(kwargs.get("model"), response) if instrumentation.ENABLED else response
+    instrumentation.record_usage(kwargs.get("model"), response.usage)
+    return response
+
+
+@contextmanager
+def refreshed_cache():
+    """Aufrufe im Block (auch in Thread-Pools über instrumentation.bind) ignorieren gecachte Antworten"""
+    token = _refresh.set(True)
+    try:
+        yield
+    finally:
+        _refresh.reset(token)
+
+
+def chat_completion(**kwargs):
+    """Wie client.chat.completions.create(...), aber mit Wiederholungen bei 429/5xx und Verbindungsfehlern
+    und - bei temperature=0 - mit persistentem Cache der Antworten"""
+    if not response_cache.cacheable(kwargs):
+        return _request(**kwargs)
+
+    key = response_cache.cache_key(kwargs)
+    cached = None
+    if not _refresh.get():
+        with instrumentation.span("openai.cache_lookup", model=kwargs.get("model")) as attributes:
+            cached = response_cache.get(key)
+            attributes["hit"] = cached is not None
+    if cached is not None:
+        print("Antwort aus dem LLM-Cache (keine Tokens verbraucht)")
+        return _from_cache(cached, kwargs.get("stream"))
+
+    response = _request(**kwargs)
+    if kwargs.get("stream"):
+        return _store_stream(key, response)
+    response_cache.put(key, response.model_dump())
+    return response
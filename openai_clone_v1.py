@@ -9,10 +9,9 @@
 # 3) Programm im Terminal starten mit 'streamlit run openai_clone.py'
 
 import streamlit as st
-import os
-import base64
-import openai
-from openai import OpenAI
+import openai_client # gemeinsamer Client mit Connection-Pool & Wiederholungen
+import image_pipeline # Bilder verkleinern & kodieren, Ergebnis wird pro Bild zwischengespeichert
+import prewarm # schwere Bibliotheken nach der ersten Anzeige im Hintergrund laden
 
 def main():
     # Title and Header
@@ -54,14 +53,13 @@ def main():
     #st.markdown("This web application is powered by OpenAI's GPT-4 API. It allows interaction via both text input and image upload for processing queries.")  # Footer description
 
 
-# Function to encode the image
+# Function to encode the image: verkleinert, mit passendem MIME-Typ, als data-URL
 def encode_image(uploaded_file):
-    return base64.b64encode(uploaded_file.getvalue()).decode('utf-8')
+    return image_pipeline.image_data_url(uploaded_file.getvalue())
 
 
 def call_gpt4_api(user_input, uploaded_file=None):
-    # Calling OpenAI's GPT-4 API
-    client = OpenAI(api_key=os.environ.get("OPENAI_API_KEY"))  # Initialize OpenAI client with API key from environment variables
+    # Calling OpenAI's GPT-4 API (über den gemeinsamen, prozessweiten Client)
 
     system_prompt = """You are an educational assistant for Year 12 A-Level students studying Psychology, Biology, and Geography.
                     Your role is to provide accurate answers and guide students in understanding how to derive those answers themselves.
@@ -74,7 +72,7 @@ def call_gpt4_api(user_input, uploaded_file=None):
     try:
         # Prepare the conversation context messages
         if uploaded_file:
-            base64_image = encode_image(uploaded_file)
+            image_url = encode_image(uploaded_file)
             messages = [
                 {"role": "system", "content": system_prompt}, # System message to set the assistant's behavior
                 {"role": "user", "content": [
@@ -84,7 +82,7 @@ def call_gpt4_api(user_input, uploaded_file=None):
                     },
                     {
                         "type": "image_url",
-                        "image_url": {"url":  f"data:image/jpeg;base64,{base64_image}"},
+                        "image_url": {"url":  image_url},
                     },
                     ],
                 }
@@ -96,14 +94,15 @@ def call_gpt4_api(user_input, uploaded_file=None):
                 ]
 
         # Make the API call to GPT-4 with the provided messages
-        response = client.chat.completions.create(
+        response = openai_client.chat_completion(
           model="gpt-4o-mini",
           messages=messages,
           temperature=0.6,
         )
         return response.choices[0].message.content.strip()  # Return the response text from GPT-4
-    except openai.APIError as e: #Handle API error here, e.g. retry or log
+    except openai_client.APIError as e: #Handle API error here, e.g. retry or log
         return f"OpenAI API returned an API Error: {str(e)}"
 
 if __name__ == "__main__":
     main()  # Run the main function to start the Streamlit app
+    prewarm.start(modules=("openai", "PIL.Image"), resources=(openai_client.get_client,))
@@ -9,10 +9,10 @@
 # 3) Programm im Terminal starten mit 'streamlit run openai_clone.py'
 
 import streamlit as st
-import os
-import base64
-import openai
-from openai import OpenAI
+import openai_client # gemeinsamer Client mit Connection-Pool & Wiederholungen
+import image_pipeline # Bilder verkleinern & kodieren, Ergebnis wird pro Bild zwischengespeichert
+import prewarm # schwere Bibliotheken nach der ersten Anzeige im Hintergrund laden
+import chat_context # Token-Budget für den Gesprächskontext
 
 def main():
     # Title and Header
@@ -33,6 +33,8 @@ def main():
     # Initialize chat history in session state
     if 'chat_history' not in st.session_state:
         st.session_state.chat_history = []
+    if 'chat_context' not in st.session_state:
+        st.session_state.chat_context = chat_context.new_state()
 
     # Handle the submission when the button is clicked
     if submit_button:
@@ -47,9 +49,10 @@ def main():
             # If inputs are valid, process them
             st.write("Your input has been received. Processing...")
             try:
-                response, updated_chat_history = call_gpt4_api(user_input, uploaded_file, st.session_state.chat_history)  # Call process_input to handle the provided inputs
+                response, updated_chat_history = call_gpt4_api(user_input, uploaded_file, st.session_state.chat_history, st.session_state.chat_context)  # Call process_input to handle the provided inputs
                 st.session_state.chat_history = updated_chat_history  # Update the chat history in session state
                 st.write(response)  # Display the response from GPT-4
+                st.caption(st.session_state.chat_context.get("info", ""))  # Display the input size of this turn
             except Exception as e:
                 st.error(f"An unexpected error occurred during 'process_input': {str(e)}")  # Display an error if something goes wrong
 
@@ -63,13 +66,12 @@ def main():
     #st.markdown("This web application is powered by OpenAI's GPT-4 API. It allows interaction via both text input and image upload for processing queries.")  # Footer description
 
 
-# Function to encode the image
+# Function to encode the image: verkleinert, mit passendem MIME-Typ, als data-URL
 def encode_image(uploaded_file):
-    return base64.b64encode(uploaded_file.getvalue()).decode('utf-8')
+    return image_pipeline.image_data_url(uploaded_file.getvalue())
 
-def call_gpt4_api(user_input, uploaded_file=None, chat_history=[]):
-    # Calling OpenAI's GPT-4 API
-    client = OpenAI(api_key=os.environ.get("OPENAI_API_KEY"))  # Initialize OpenAI client with API key from environment variables
+def call_gpt4_api(user_input, uploaded_file=None, chat_history=[], context_state=None):
+    # Calling OpenAI's GPT-4 API (über den gemeinsamen, prozessweiten Client)
 
     system_prompt = """You are an educational assistant for Year 12 A-Level students studying Psychology, Biology, and Geography.
                     Your role is to provide accurate answers and guide students in understanding how to derive those answers themselves.
@@ -79,25 +81,28 @@ def call_gpt4_api(user_input, uploaded_file=None, chat_history=[]):
                     - Clear and Supportive: Keep explanations clear and supportive, ensuring students feel encouraged and confident.
                     """
 
-    # Prepare the conversation context messages
-    messages = [{"role": "system", "content": system_prompt}] + chat_history
+    # Prepare the conversation context messages (ältere Nachrichten werden zusammengefasst, siehe chat_context.py)
+    if context_state is None:
+        context_state = chat_context.new_state()
+    messages = [{"role": "system", "content": system_prompt}] + chat_context.build_context(chat_history, context_state)
     if uploaded_file:
         # Encode the image if provided
-        base64_image = encode_image(uploaded_file)
+        image_url = encode_image(uploaded_file)
         # Add user input to chat history
         messages.append(
             {"role": "user", "content": [
                 {"type": "text", "text": user_input},
-                {"type": "image_url", "image_url": {"url": f"data:image/jpeg;base64,{base64_image}"}}
+                {"type": "image_url", "image_url": {"url": image_url}}
                 ]
             }
         )
     else:
         messages.append({"role": "user", "content": user_input})
+    context_state["info"] = chat_context.context_info(messages, context_state["summarized_upto"])
 
     try:
         # Make the API call to GPT-4 with the provided messages
-        response = client.chat.completions.create(
+        response = openai_client.chat_completion(
           model="gpt-4o",
           messages=messages,
           temperature=0.6,
@@ -111,8 +116,9 @@ def call_gpt4_api(user_input, uploaded_file=None, chat_history=[]):
 
         return assistant_response, chat_history  # Return both response and updated chat history
 
-    except openai.APIError as e: # Handle API error here, e.g., retry or log
+    except openai_client.APIError as e: # Handle API error here, e.g., retry or log
         return f"OpenAI API returned an API Error: {str(e)}", chat_history
 
 if __name__ == "__main__":
     main()  # Run the main function to start the Streamlit app
+    prewarm.start(modules=("openai", "PIL.Image"), resources=(openai_client.get_client,))
@@ -10,12 +10,34 @@
 
 import streamlit as st
 import os
-import io
-import fitz  # PyMuPDF
-import base64
-from PIL import Image
-import openai
-from openai import OpenAI
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import openai_client # gemeinsamer Client mit Connection-Pool & Wiederholungen
+import image_pipeline # Bilder verkleinern & kodieren, Ergebnis wird pro Bild zwischengespeichert
+import chat_context # Token-Budget für den Gesprächskontext
+import chat_render # inkrementelle Darstellung des Chat-Verlaufs
+import instrumentation # optionale Laufzeit-Messung je Rerun (PERF_INSTRUMENTATION=1)
+import prewarm # schwere Bibliotheken nach der ersten Anzeige im Hintergrund laden
+
+# Gemeinsamer Speicher für hochgeladene Dateien (dedupliziert, große Dateien per mmap)
+import upload_store
+# Cache für extrahierten PDF-Text (gemeinsam mit PDF_Summary_Streamlit.py)
+import pdf_cache
+# Text-Extraktion mit wählbarem Backend
+import pdf_extraction
+PDF_BACKEND = os.getenv("PDF_BACKEND", "pymupdf")
+# Kopf- & Fußzeilen, Seitenzahlen, Worttrennungen & Leerraum vor dem Prompt entfernen (PROMPT_COMPACTION=0 schaltet das ab)
+import text_compaction
+PAGES_CACHE_KEY = PDF_BACKEND + text_compaction.CACHE_SUFFIX
+# Lokaler BM25-Suchindex, damit pro Frage nur die relevanten Abschnitte des PDFs mitgeschickt werden
+import pdf_retrieval
+# Gecachte Vorschaubilder der PDF-Seiten
+import pdf_thumbnails
+from chunked_summary import estimate_tokens
+
+FULL_DOCUMENT_TOKENS = 4000 # kleinere Dokumente werden weiterhin vollständig mitgeschickt
+IMAGE_EXTENSIONS = ['png', 'jpg', 'jpeg', 'webp', 'gif']
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", "4")) # Dateien, die gleichzeitig eingelesen werden
+_ingest_pool = None
 
 OPENAI_MODEL = "o4-mini"
 # Keys einlesen
@@ -25,59 +47,118 @@ OPENAI_MODEL = "o4-mini"
 
 def handle_input_submit():
     """Callback for when text input changes"""
+    # Die Frage wird erst im Hauptlauf beantwortet, damit die Antwort dort Token für Token angezeigt werden kann
     if st.session_state.user_input:
-        try:
-            call_openai_api()
-            st.session_state.user_input = ""
-        except Exception as e:
-            st.error(f"Ein unerwarteter Fehler ist während der 'handle_input_submit()' aufgetreten: {str(e)}")
+        st.session_state.pending_input = st.session_state.user_input
+        st.session_state.user_input = ""
 
 
-def handle_file_upload():
-    """Callback for when a file is uploaded"""
-    if st.session_state.uploaded_file is not None:
-        # Determine file type
-        file_extension = st.session_state.uploaded_file.name.lower().split('.')[-1]
-        image_extensions = ['png', 'jpg', 'jpeg', 'webp', 'gif']
-
-        if file_extension in image_extensions:
-            st.session_state.uploaded_file_type = "Image"
-            st.session_state.displayed_image = True
-
-        elif file_extension == 'pdf':
-            st.session_state.uploaded_file_type = "PDF"
-            st.session_state.displayed_image = True
-            # Bytes aus Streamlit-Upload lesen
-            #pdf_bytes = st.session_state.uploaded_file.read()
-            st.session_state.uploaded_file_stream = io.BytesIO(st.session_state.uploaded_file.read())
+def file_type(name):
+    # "Image", "PDF" oder None für nicht unterstützte Dateien
+    file_extension = name.lower().split('.')[-1]
+    if file_extension in IMAGE_EXTENSIONS:
+        return "Image"
+    return "PDF" if file_extension == 'pdf' else None
 
-        else:
-            st.error("Unsupported file type. Please upload an image or PDF file.")
-            st.session_state.uploaded_file_type = None
-            st.session_state.displayed_image = False
-            return
-    else:
-        st.session_state.uploaded_file_type = None
-        st.session_state.displayed_image = False
+
+def add_document(name, data):
+    """Nimmt eine Datei in den Chat auf (ein bereits vorhandenes Dokument bleibt unverändert); Rückgabe: Hash als Schlüssel"""
+    doc_hash = upload_store.store.add(data, st.session_state.upload_owner)
+    if doc_hash not in st.session_state.documents:
+        st.session_state.documents[doc_hash] = {"name": name, "type": file_type(name), "ready": False}
+    return doc_hash
+
+
+def remove_document(doc_hash):
+    upload_store.store.release(doc_hash, st.session_state.upload_owner)
+    st.session_state.documents.pop(doc_hash, None)
 
 
+def handle_file_upload():
+    """Callback for when files are uploaded or removed"""
+    # Die Dokumente der Session mit der Liste im Uploader abgleichen; der Inhalt liegt nur einmal im Upload-Speicher
+    current = set()
+    for uploaded_file in st.session_state.uploaded_files or []:
+        if file_type(uploaded_file.name) is None:
+            st.error(f"Unsupported file type: {uploaded_file.name}. Please upload images or PDF files.")
+            continue
+        current.add(add_document(uploaded_file.name, uploaded_file.getvalue()))
+    for doc_hash in list(st.session_state.documents):
+        if doc_hash not in current:
+            remove_document(doc_hash)
+    st.session_state.displayed_image = bool(st.session_state.documents)
+
 
 def clear_chat():
     """Callback to clear the chat"""
     st.session_state.chat_history = []
+    st.session_state.chat_context = chat_context.new_state()
+    chat_render.reset_chat_history_view()
     st.session_state.user_input = ""
     st.session_state.displayed_image = False
 
 
-def get_all_text_from_pdf(pdf_stream):
-    # Datei öffnen und Text extrahieren
+def document_data(doc_hash):
+    # Inhalt eines Dokuments als memoryview aus dem Upload-Speicher (ohne Kopie)
     try:
-        doc = fitz.open(stream=pdf_stream, filetype="pdf")
-        # Text aus allen Seiten extrahieren
-        extracted_text = ""
-        for page in doc:
-            extracted_text += page.get_text("text") + "\n"
-        print(f"Länge des Dokuments = {len(doc)} Seiten")
+        return upload_store.store.view(doc_hash)
+    except KeyError:
+        # Nach langer Inaktivität gelöscht: aus dem Upload von Streamlit neu anlegen
+        for uploaded_file in st.session_state.get("uploaded_files") or []:
+            if pdf_cache.document_hash(uploaded_file.getvalue()) == doc_hash:
+                upload_store.store.add(uploaded_file.getvalue(), st.session_state.upload_owner)
+                return upload_store.store.view(doc_hash)
+        raise
+
+
+def _ingest(doc_hash, kind, data):
+    # Läuft im Worker-Pool: Text & Suchindex & Vorschaubild eines PDFs bzw. Payload eines Bilds vorbereiten
+    # Alles landet in den Caches (pro Hash), ein erneut hochgeladenes Dokument ist daher sofort fertig
+    if kind == "PDF":
+        pages = pdf_cache.cached_pages(data, PAGES_CACHE_KEY, extract_pages)
+        pdf_retrieval.get_index(doc_hash, pages)
+        pdf_thumbnails.thumbnail_png(data, 0, doc_hash=doc_hash)
+    else:
+        image_pipeline.image_data_url(data, doc_hash)
+
+
+def ingest_documents():
+    """Liest alle neuen Dokumente der Session parallel ein"""
+    global _ingest_pool
+    pending = {doc_hash: document for doc_hash, document in st.session_state.documents.items() if not document["ready"]}
+    if not pending:
+        return
+    if _ingest_pool is None:
+        _ingest_pool = ThreadPoolExecutor(max_workers=INGEST_WORKERS, thread_name_prefix="ingest")
+    with st.spinner(f"{len(pending)} Datei(en) werden eingelesen ..."):
+        futures = {_ingest_pool.submit(instrumentation.bind(_ingest), doc_hash, document["type"], document_data(doc_hash)): doc_hash
+                   for doc_hash, document in pending.items()}
+        for future in as_completed(futures):
+            document = pending[futures[future]]
+            try:
+                future.result()
+            except Exception as e:
+                st.error(f"{document['name']} konnte nicht eingelesen werden: {e}")
+            document["ready"] = True
+
+
+def _extract_pages(pdf_bytes):
+    # Text aus allen Seiten extrahieren (große Dokumente parallel, siehe pdf_extraction.py)
+    return pdf_extraction.extract_pages(pdf_bytes, PDF_BACKEND)
+
+
+# Extraktor für den pdf_cache: extrahieren & kompaktieren, pro Dokument nur einmal
+extract_pages = text_compaction.compacted(_extract_pages)
+
+
+def get_all_text_from_pdf(pdf_data):
+    # Datei öffnen und Text extrahieren; pro Dokument nur einmal, danach aus dem Cache
+    # 'pdf_data': Inhalt des PDFs (bytes oder memoryview aus dem Upload-Speicher)
+    try:
+        with instrumentation.span("pdf.extract", backend=PDF_BACKEND):
+            pages = pdf_cache.cached_pages(pdf_data, PAGES_CACHE_KEY, extract_pages)
+        extracted_text = "".join(page + "\n" for page in pages)
+        print(f"Länge des Dokuments = {len(pages)} Seiten")
         print(f"Anzahl Zeichen = {len(extracted_text)}")
         return extracted_text
 
@@ -85,13 +166,27 @@ def get_all_text_from_pdf(pdf_stream):
         print(f"Fehler in get_all_text_from_pdf: {e}")
 
 
-# Function to encode the image
-def encode_image(uploaded_file):
-    return base64.b64encode(uploaded_file.getvalue()).decode('utf-8')
+def relevant_pdf_chunks(doc_hashes, query):
+    # Die zur Frage passenden Abschnitte aus allen PDFs: Liste von (Dokument-Hash, Seitennummer, Text)
+    # Jeder Suchindex wird pro Dokument nur einmal aufgebaut; die besten Treffer aller Dokumente werden gemischt
+    scored = []
+    with instrumentation.span("retrieval.search", documents=len(doc_hashes)):
+        for doc_hash in doc_hashes:
+            pages = pdf_cache.cached_pages(document_data(doc_hash), PAGES_CACHE_KEY, extract_pages)
+            index = pdf_retrieval.get_index(doc_hash, pages)
+            scored += [(score, doc_hash, page, text) for score, page, text in index.scored_search(query)]
+    best = sorted(scored, key=lambda entry: -entry[0])[:pdf_retrieval.TOP_K]
+    # In Dokument- und Seitenreihenfolge zurückgeben
+    return [(doc_hash, page, text) for _, doc_hash, page, text in sorted(best, key=lambda entry: (doc_hashes.index(entry[1]), entry[2]))]
 
-def call_openai_api():
-    # Calling OpenAI's GPT-4 API
-    client = OpenAI(api_key=os.environ.get("OPENAI_API_KEY"))  # Initialize OpenAI client with API key from environment variables
+
+# Function to encode the image: verkleinert, mit passendem MIME-Typ, als data-URL
+def encode_image(image_data, doc_hash=None):
+    return image_pipeline.image_data_url(image_data, doc_hash)
+
+def call_openai_api(user_input):
+    # Calling OpenAI's GPT-4 API im Streaming-Modus (über den gemeinsamen, prozessweiten Client): liefert die Antwort stückweise (Generator), sobald die Tokens eintreffen
+    # Nach dem letzten Token wird die vollständige Antwort in den Chat-Verlauf übernommen
 
     system_prompt = """You are an educational assistant for Year 12 A-Level students.
                     Your role is to provide accurate answers and guide students in understanding how to derive those answers themselves.
@@ -102,61 +197,76 @@ def call_openai_api():
                     - Only use Markdown format, never Latex format
                     """
 
-    # Prepare the conversation context messages
-    messages = [{"role": "system", "content": system_prompt}] + st.session_state.chat_history
-    if st.session_state.uploaded_file:
-        if st.session_state.uploaded_file_type == "Image":
-            # Encode the image if provided
-            base64_image = encode_image(st.session_state.uploaded_file)
-            # Add user input to chat history
-            messages.append(
-                {"role": "user", "content": [
-                    {"type": "text", "text": st.session_state.user_input},
-                    {"type": "image_url", "image_url": {"url": f"data:image/jpeg;base64,{base64_image}"}}
-                    ]
-                }
-            )
-        elif st.session_state.uploaded_file_type == "PDF":
-            pdf_text = get_all_text_from_pdf(st.session_state.uploaded_file_stream)
-            user_query = f"*** Inhalt des Dokuments ***\n<Dokument-Text>{pdf_text}</Dokument-Text>\n*** User-Query ***\n<User-Query>{st.session_state.user_input}</User-Query>"
-            messages.append({"role": "user", "content": user_query})
-
+    # Prepare the conversation context messages (ältere Nachrichten werden zusammengefasst, siehe chat_context.py)
+    messages = [{"role": "system", "content": system_prompt}] + chat_context.build_context(st.session_state.chat_history, st.session_state.chat_context)
+    documents = st.session_state.documents
+    pdfs = [doc_hash for doc_hash, document in documents.items() if document["type"] == "PDF"]
+    images = [doc_hash for doc_hash, document in documents.items() if document["type"] == "Image"]
+    user_query = user_input
+    if pdfs:
+        pdf_texts = {doc_hash: get_all_text_from_pdf(document_data(doc_hash)) or "" for doc_hash in pdfs}
+        if sum(estimate_tokens(text) for text in pdf_texts.values()) <= FULL_DOCUMENT_TOKENS:
+            document_texts = "\n".join(f'<Dokument-Text name="{documents[doc_hash]["name"]}">{text}</Dokument-Text>' for doc_hash, text in pdf_texts.items())
+            header = "*** Inhalt der Dokumente (bitte in der Antwort angeben, aus welchem Dokument eine Aussage stammt) ***" if len(pdfs) > 1 else "*** Inhalt des Dokuments ***"
+            user_query = f"{header}\n{document_texts}\n*** User-Query ***\n<User-Query>{user_input}</User-Query>"
+        else:
+            excerpts = "\n\n".join(f"[{documents[doc_hash]['name']}, Seite {page}]\n{text}" for doc_hash, page, text in relevant_pdf_chunks(pdfs, user_input))
+            user_query = f"*** Relevante Auszüge aus den Dokumenten (mit Dokument & Seitenangabe, bitte in der Antwort zitieren) ***\n<Dokument-Auszüge>{excerpts}</Dokument-Auszüge>\n*** User-Query ***\n<User-Query>{user_input}</User-Query>"
+
+    if images:
+        # Encode the images (each with its file name, so the answer can refer to it)
+        content = [{"type": "text", "text": user_query}]
+        for doc_hash in images:
+            if len(images) > 1:
+                content.append({"type": "text", "text": f"Bild: {documents[doc_hash]['name']}"})
+            content.append({"type": "image_url", "image_url": {"url": encode_image(document_data(doc_hash), doc_hash)}})
+        messages.append({"role": "user", "content": content})
     else:
-        messages.append({"role": "user", "content": st.session_state.user_input})
+        messages.append({"role": "user", "content": user_query})
+    st.session_state.chat_context["info"] = chat_context.context_info(messages, st.session_state.chat_context["summarized_upto"])
 
-    try:
-        # Make the API call to GPT-4 with the provided messages
-        response = client.chat.completions.create(
-          model=OPENAI_MODEL,
-          messages=messages,
-          temperature=1,
-        )
+    # Make the API call to GPT-4 with the provided messages
+    response = openai_client.chat_completion(
+      model=OPENAI_MODEL,
+      messages=messages,
+      temperature=1,
+      stream=True,
+    )
 
-        # Extract assistant response
-        assistant_response = response.choices[0].message.content.strip()
+    # Tokens weiterreichen, sobald sie eintreffen, und dabei die vollständige Antwort zusammensetzen
+    parts = []
+    for chunk in response:
+        if chunk.choices and chunk.choices[0].delta.content:
+            parts.append(chunk.choices[0].delta.content)
+            yield chunk.choices[0].delta.content
 
-        # Add assistant response to chat history
-        st.session_state.chat_history += [{"role": "user", "content": st.session_state.user_input}, {"role": "assistant", "content": assistant_response}]
+    # Extract assistant response
+    assistant_response = "".join(parts).strip()
 
-    except openai.APIError as e: # Handle API error here, e.g., retry or log
-        return f"OpenAI API returned an API Error: {str(e)}", chat_history
+    # Add assistant response to chat history
+    st.session_state.chat_history += [{"role": "user", "content": user_input}, {"role": "assistant", "content": assistant_response}]
 
 
 # Main UI layout
+@instrumentation.instrumented_run
 def main():
     # Initialize session state variables if they don't exist
     if 'chat_history' not in st.session_state:
         st.session_state.chat_history = []
+    if 'chat_context' not in st.session_state:
+        st.session_state.chat_context = chat_context.new_state()
     if 'user_input' not in st.session_state:
         st.session_state.user_input = ""
     if 'displayed_image' not in st.session_state:
         st.session_state.displayed_image = False
-    if 'uploaded_file_type' not in st.session_state:
-        st.session_state.uploaded_file_type = None
+    if 'documents' not in st.session_state:
+        st.session_state.documents = {} # Hash -> {"name", "type", "ready"}, in der Reihenfolge des Uploads
+    if 'upload_owner' not in st.session_state:
+        st.session_state.upload_owner = upload_store.Owner() # hält die Referenzen im Upload-Speicher
     if 'uploaded_file_text' not in st.session_state:
         st.session_state.uploaded_file_text = ""
-    if 'uploaded_file_stream' not in st.session_state:
-        st.session_state.uploaded_file_stream = ""
+    if 'pending_input' not in st.session_state:
+        st.session_state.pending_input = ""
 
     # Set page configuration for full screen layout
     st.set_page_config(layout="wide")
@@ -185,44 +295,65 @@ def main():
         # File uploader with callback
         st.file_uploader(
             "Falls gewünscht, lade eine Datei hoch ...",
-            accept_multiple_files=False,
+            accept_multiple_files=True,
             type=["pdf", "png", "jpg", "jpeg", "gif"],
-            key="uploaded_file",
+            key="uploaded_files",
             on_change=handle_file_upload
         )
 
-        # Display uploaded image if present
-        if st.session_state.uploaded_file and st.session_state.displayed_image:
-            if st.session_state.uploaded_file_type == "Image":
-                st.image(
-                    st.session_state.uploaded_file,
-                    caption="Hochgeladenes Bild",
-                    use_container_width=True
-                )
-            elif st.session_state.uploaded_file_type == "PDF":
-                doc = fitz.open(stream=st.session_state.uploaded_file_stream, filetype="pdf")
-                # Erste Seite rendern
-                page = doc[0]
-                pix = page.get_pixmap()  # Erstellt ein Bildobjekt (Pixmap)
-
-                # Pixmap in ein PIL-Bild umwandeln
-                img = Image.frombytes("RGB", [pix.width, pix.height], pix.samples)
-                st.image(img, use_container_width=True)
+        # Neue Dateien parallel einlesen (Text, Suchindex, Vorschaubilder)
+        ingest_documents()
+
+        # Display uploaded images & first pages of the PDFs if present
+        documents = st.session_state.documents
+        if documents and st.session_state.displayed_image:
+            for column, (doc_hash, document) in zip(st.columns(2) * len(documents), documents.items()):
+                if document["type"] == "Image":
+                    # verkleinertes Bild aus image_pipeline, nicht das Original aus dem Upload-Speicher
+                    column.image(image_pipeline.display_image(document_data(doc_hash), doc_hash), caption=document["name"], use_container_width=True)
+                else:
+                    column.image(pdf_thumbnails.thumbnail_png(document_data(doc_hash), 0, doc_hash=doc_hash), caption=document["name"], use_container_width=True)
+
+            # Optionaler Vorschau-Streifen für ein PDF; gerendert werden nur die gerade sichtbaren Seiten
+            pdfs = {doc_hash: document["name"] for doc_hash, document in documents.items() if document["type"] == "PDF"}
+            if pdfs and st.toggle("Alle Seiten anzeigen", key="show_page_strip"):
+                doc_hash = next(iter(pdfs))
+                if len(pdfs) > 1:
+                    doc_hash = st.selectbox("Dokument", list(pdfs), format_func=pdfs.get)
+                pdf_bytes = document_data(doc_hash)
+                num_pages = pdf_thumbnails.page_count(pdf_bytes, doc_hash)
+                first_page = 0
+                if num_pages > pdf_thumbnails.STRIP_PAGES:
+                    first_page = st.number_input("Ab Seite", min_value=1, max_value=num_pages, step=pdf_thumbnails.STRIP_PAGES, value=1) - 1
+                thumbnails = pdf_thumbnails.thumbnail_strip(pdf_bytes, first_page, doc_hash=doc_hash)
+                for column, (page_number, png) in zip(st.columns(3) * 2, thumbnails):
+                    column.image(png, caption=f"Seite {page_number}", use_container_width=True)
 
     # Display chat history and responses in second column
     with col2:
+        # Offene Frage beantworten; die Antwort erscheint Token für Token und danach im Chat Verlauf
+        if st.session_state.pending_input:
+            user_input = st.session_state.pending_input
+            st.session_state.pending_input = ""
+            streaming_placeholder = st.empty()
+            try:
+                with streaming_placeholder.container():
+                    st.markdown(chat_render.render_message({"role": "user", "content": user_input}), unsafe_allow_html=True)
+                    st.write_stream(call_openai_api(user_input))
+                streaming_placeholder.empty()
+            except openai_client.APIError as e: # Handle API error here, e.g., retry or log
+                st.error(f"OpenAI API returned an API Error: {str(e)}")
+            except Exception as e:
+                st.error(f"Ein unerwarteter Fehler ist während der 'call_openai_api()' aufgetreten: {str(e)}")
+
         if st.session_state.chat_history:
             st.header("Chat Verlauf")
-            chat_history_text = ""
-            for entry in reversed(st.session_state.chat_history):
-                if entry['role'] == 'user':
-                    chat_history_text += f"<div style='text-align: right; color: green; margin-bottom: 10px;'>{entry['content']}</div><br>\n"
-                else:
-                    chat_history_text += f"<div style='text-align: left; margin-bottom: 10px;'>{entry['content']}</div><br>\n"
-
-            # Display chat history with HTML formatting inside a scrollable container
-            st.markdown(f"<div style='height: calc(100vh - 150px); overflow-y: scroll; padding-right: 10px;'>{chat_history_text}</div>", unsafe_allow_html=True)
+            if st.session_state.chat_context.get("info"):
+                st.caption(st.session_state.chat_context["info"])  # Display the input size of the last turn
+            chat_render.show_chat_history(st.session_state.chat_history)
 
 
 if __name__ == "__main__":
     main()  # Run the main function to start the Streamlit app
+    prewarm.start(modules=("openai", "openai.types.chat", "fitz", "PIL.Image", "numpy", "scipy.sparse"),
+                  resources=(openai_client.get_client,))
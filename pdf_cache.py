@@ -0,0 +1,154 @@
+# Cache für den aus PDF-Dateien extrahierten Text
+# Wird von PDF_Summary_Streamlit.py und openai_clone_v4.py gemeinsam genutzt, damit ein PDF pro Prozess
+# nur einmal geparst wird und nicht bei jedem Streamlit-Rerun bzw. bei jeder Chat-Runde erneut.
+#
+# Der Schlüssel ist ein SHA-256 Hash über die hochgeladenen Bytes plus der Name des Extraktors
+# (pypdf und PyMuPDF liefern leicht unterschiedlichen Text und werden daher getrennt abgelegt).
+#
+# Stufe 1: In-Memory LRU, begrenzt auf PDF_CACHE_MAX_ITEMS Dokumente (Default 32)
+# Stufe 2: optionales Verzeichnis auf der Festplatte, aktiviert über die Systemvariable PDF_CACHE_DIR;
+#          überschreitet das Verzeichnis PDF_CACHE_MAX_MB (Default 200), werden die am längsten
+#          nicht benutzten Einträge gelöscht
+#
+# Gleichzeitige Anfragen für dasselbe Dokument & denselben Extraktor werden zu einer Extraktion zusammengefasst.
+
+import os
+import json
+import hashlib
+import threading
+from collections import OrderedDict
+
+import single_flight
+
+
+def document_hash(data):
+    """SHA-256 Hash über den Inhalt einer hochgeladenen Datei"""
+    return hashlib.sha256(data).hexdigest()
+
+
+class ExtractionCache:
+    def __init__(self, max_items=32, cache_dir=None, max_disk_bytes=200 * 1024 * 1024):
+        self.max_items = max_items
+        self.cache_dir = cache_dir
+        self.max_disk_bytes = max_disk_bytes
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        if self.cache_dir:
+            os.makedirs(self.cache_dir, exist_ok=True)
+
+    def get(self, key):
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                return self._memory[key]
+
+        pages = self._read_disk(key)
+        if pages is not None:
+            self._put_memory(key, pages)
+        return pages
+
+    def put(self, key, pages):
+        self._put_memory(key, pages)
+        self._write_disk(key, pages)
+
+    def get_or_extract(self, data, extractor_name, extract_fn, doc_hash=None):
+        """Liefert die Seitentexte aus dem Cache oder ruft 'extract_fn(data)' auf und legt das Ergebnis ab
+
+        Wird dasselbe Dokument gleichzeitig in mehreren Sessions angefragt, extrahiert nur eine davon (single_flight.py).
+        Ist 'doc_hash' bereits bekannt, entfällt das erneute Hashen der Bytes.
+        """
+        doc_hash = doc_hash or document_hash(data)
+        key = f"{doc_hash}-{extractor_name}"
+        pages = self.get(key)
+        if pages is None:
+            pages = single_flight.run((doc_hash, f"extract:{extractor_name}", id(self)), lambda: self._extract(key, data, extract_fn))
+        return pages
+
+    def _extract(self, key, data, extract_fn):
+        # Ein gerade beendeter Aufruf kann das Ergebnis inzwischen abgelegt haben
+        pages = self.get(key)
+        if pages is None:
+            pages = list(extract_fn(data))
+            self.put(key, pages)
+        return pages
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+
+    def _put_memory(self, key, pages):
+        with self._lock:
+            self._memory[key] = pages
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_items:
+                self._memory.popitem(last=False)
+
+    def _disk_path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def _read_disk(self, key):
+        if not self.cache_dir:
+            return None
+        path = self._disk_path(key)
+        try:
+            with open(path, encoding="utf-8") as f:
+                pages = json.load(f)
+            os.utime(path)  # Zugriffszeit für die LRU-Verdrängung auf der Platte aktualisieren
+            return pages
+        except (OSError, ValueError):
+            return None
+
+    def _write_disk(self, key, pages):
+        if not self.cache_dir:
+            return
+        path = self._disk_path(key)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(pages, f, ensure_ascii=False)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"PDF-Cache konnte nicht geschrieben werden: {e}")
+            return
+        self._evict_disk()
+
+    def _evict_disk(self):
+        # Größenbasierte Verdrängung: älteste Einträge zuerst löschen, bis das Limit wieder eingehalten wird
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith(".json"):
+                continue
+            path = os.path.join(self.cache_dir, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_disk_bytes:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                pass
+
+
+# Prozessweiter Cache, konfigurierbar über Systemvariablen
+_cache = ExtractionCache(
+    max_items=int(os.getenv("PDF_CACHE_MAX_ITEMS", "32")),
+    cache_dir=os.getenv("PDF_CACHE_DIR") or None,
+    max_disk_bytes=int(float(os.getenv("PDF_CACHE_MAX_MB", "200")) * 1024 * 1024),
+)
+
+
+def cached_pages(data, extractor_name, extract_fn, doc_hash=None):
+    """Seitentexte eines PDFs (als Liste von Strings) - pro Dokument & Extraktor nur einmal berechnet"""
+    return _cache.get_or_extract(data, extractor_name, extract_fn, doc_hash)
+
+
+def clear():
+    """Leert den Speicher-Cache (z.B. für Messungen ohne Cache); das Verzeichnis bleibt erhalten"""
+    _cache.clear()
@@ -0,0 +1,183 @@
+# Text-Extraktion aus PDF-Dateien mit wählbarem Backend
+# - "pypdf":          pypdf, reines Python (bisher in PDF_Summary_Streamlit.py)
+# - "pymupdf":        PyMuPDF, Text im Lesefluss (bisher in openai_clone_v4.py)
+# - "pymupdf-blocks": PyMuPDF, Textblöcke sortiert nach Position, Absätze durch Leerzeilen getrennt
+#
+# Große Dokumente (ab PARALLEL_MIN_PAGES Seiten) werden in Seitenbereiche aufgeteilt und in einem
+# Prozess-Pool parallel extrahiert. Welches Backend für welche Dokumente am schnellsten ist, zeigt
+# 'python benchmarks/extraction.py <pdf-dateien>'.
+#
+# Alternativ liefert 'iter_pages' die Seiten einzeln, erst wenn sie gebraucht werden. Zusammen mit
+# 'pages_before_appendix' endet die Extraktion an der Überschrift des Literaturverzeichnisses, die oft
+# 20-40 Seiten langen Literaturangaben werden dann gar nicht erst geparst. Große Dokumente extrahiert auch
+# 'iter_pages' parallel: Seitenbereiche von RANGE_PAGES Seiten, höchstens so viele im Voraus, wie es Worker gibt.
+
+import io
+import os
+import re
+import threading
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+BACKENDS = ("pypdf", "pymupdf", "pymupdf-blocks")
+PARALLEL_MIN_PAGES = 64 # darunter lohnt der Start der Worker-Prozesse nicht
+RANGE_PAGES = 16 # Seiten je Bereich für 'iter_pages'; nach dem Abbruch am Anhang sind höchstens MAX_WORKERS Bereiche umsonst extrahiert
+APPENDIX_MARKERS = ("References", "Bibliography", "Literature Cited", "Works Cited", "Literatur", "Literaturverzeichnis")
+APPENDIX_MIN_POSITION = 0.3 # Überschriften in den ersten 30% des Dokuments (z.B. Inhaltsverzeichnis) werden ignoriert
+MAX_WORKERS = int(os.getenv("PDF_EXTRACTION_WORKERS", str(min(4, os.cpu_count() or 1))))
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _open(pdf_bytes, backend):
+    if backend == "pypdf":
+        from pypdf import PdfReader
+        return PdfReader(io.BytesIO(pdf_bytes)).pages
+    import fitz  # PyMuPDF
+    return fitz.open(stream=pdf_bytes, filetype="pdf")
+
+
+def _page_text(doc, backend, page_num):
+    if backend == "pypdf":
+        return doc[page_num].extract_text()
+    if backend == "pymupdf":
+        return doc[page_num].get_text("text")
+    # "pymupdf-blocks": nur Textblöcke (Typ 0), von oben nach unten sortiert
+    return "\n\n".join(block[4].strip() for block in doc[page_num].get_text("blocks", sort=True) if block[6] == 0)
+
+
+def page_count(pdf_bytes, backend="pymupdf"):
+    return len(_open(pdf_bytes, backend))
+
+
+def _extract_range(pdf_bytes, backend, first_page, last_page):
+    # Extrahiert die Seiten first_page .. last_page-1; läuft ggf. in einem Worker-Prozess
+    doc = _open(pdf_bytes, backend)
+    return [_page_text(doc, backend, page_num) for page_num in range(first_page, last_page)]
+
+
+def iter_pages(pdf_bytes, backend="pymupdf", workers=None):
+    """Generator über die Seitentexte; jede Seite wird erst extrahiert, wenn sie abgefragt wird
+
+    Ab PARALLEL_MIN_PAGES Seiten laufen die nächsten Seitenbereiche im Prozess-Pool voraus ('workers' wie bei
+    'extract_pages'); bricht der Aufrufer ab, werden die übrigen Bereiche nicht mehr gestartet.
+    """
+    doc = _open(pdf_bytes, backend)
+    number_of_pages = len(doc)
+    workers = workers or (MAX_WORKERS if number_of_pages >= PARALLEL_MIN_PAGES else 1)
+    if workers <= 1:
+        for page_num in range(number_of_pages):
+            yield _page_text(doc, backend, page_num)
+        return
+
+    pdf_bytes = bytes(pdf_bytes)
+    pool = _get_pool() if workers == MAX_WORKERS else _new_pool(workers)
+    ranges = deque((first, min(first + RANGE_PAGES, number_of_pages)) for first in range(0, number_of_pages, RANGE_PAGES))
+    futures = deque()
+    try:
+        while ranges or futures:
+            while ranges and len(futures) < workers:
+                futures.append(pool.submit(_extract_range, pdf_bytes, backend, *ranges.popleft()))
+            yield from futures.popleft().result()
+    finally:
+        for future in futures:
+            future.cancel()
+        if pool is not _pool:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _new_pool(workers):
+    # "spawn" statt "fork": der Streamlit-Server & die Ingest-Threads von openai_clone_v4.py laufen mit mehreren
+    # Threads, ein geforkter Prozess kann dann auf einer Sperre hängen bleiben, die gerade ein anderer Thread hielt
+    return ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+
+
+def _get_pool():
+    global _pool
+    with _pool_lock: # mehrere Threads können gleichzeitig das erste große PDF extrahieren
+        if _pool is None:
+            _pool = _new_pool(MAX_WORKERS)
+        return _pool
+
+
+def extract_pages(pdf_bytes, backend="pymupdf", workers=None):
+    """Liefert den Text aller Seiten als Liste von Strings; 'workers' > 1 erzwingt, 1 verhindert die Parallelisierung"""
+    if backend not in BACKENDS:
+        raise ValueError(f"Unbekanntes Backend '{backend}', möglich sind: {', '.join(BACKENDS)}")
+
+    number_of_pages = page_count(pdf_bytes, backend)
+    workers = workers or (MAX_WORKERS if number_of_pages >= PARALLEL_MIN_PAGES else 1)
+    if workers <= 1 or number_of_pages < 2:
+        return _extract_range(pdf_bytes, backend, 0, number_of_pages)
+
+    # Seitenbereiche gleichmäßig auf die Worker verteilen; die Reihenfolge der Ergebnisse bleibt erhalten
+    step = -(-number_of_pages // workers)
+    ranges = [(first, min(first + step, number_of_pages)) for first in range(0, number_of_pages, step)]
+    pdf_bytes = bytes(pdf_bytes) # eine memoryview (z.B. aus upload_store) lässt sich nicht an Worker-Prozesse übergeben
+    pool = _get_pool() if workers == MAX_WORKERS else _new_pool(workers)
+    futures = [pool.submit(_extract_range, pdf_bytes, backend, first, last) for first, last in ranges]
+    pages = [page for future in futures for page in future.result()]
+    if pool is not _pool:
+        pool.shutdown()
+    return pages
+
+
+# Überschrift = eigene Zeile, optional nummeriert ("7 References", "VII. REFERENCES", "References:")
+def _heading_pattern(markers):
+    names = "|".join(re.escape(marker) for marker in markers)
+    return re.compile(rf"^[ \t]*(?:(?:\d+(?:\.\d+)*|[IVXLC]+)\.?[ \t]+)?(?:{names})[ \t]*:?[ \t]*$", re.IGNORECASE | re.MULTILINE)
+
+
+# Typische Zeilen eines Literaturverzeichnisses: "[12] ...", "12. Name, A.", "Name, A. B. (2019)", "... 2019."
+_CITATION_LINE = re.compile(r"^\s*(\[\d+\]|\d+\.\s+\S|\S.*\(\d{4}[a-z]?\)|\S.*\b(19|20)\d{2}[a-z]?[.,;)])")
+
+
+def _looks_like_references(text):
+    # Mindestens zwei Literaturangaben und ein nennenswerter Anteil der Zeilen; eine einzelne Zeile mit
+    # Jahreszahl ("... in 2019,") reicht nicht - dann entscheidet die nächste Seite
+    lines = [line for line in text.splitlines() if line.strip()]
+    citations = sum(1 for line in lines if _CITATION_LINE.match(line))
+    return citations >= 2 and citations >= 0.3 * len(lines)
+
+
+def _last_heading(text, pattern):
+    # Position der letzten passenden Überschrift auf der Seite (nicht irgendein Vorkommen des Worts im Fließtext)
+    matches = list(pattern.finditer(text))
+    return matches[-1].start() if matches else None
+
+
+def pages_before_appendix(pages, markers=APPENDIX_MARKERS, number_of_pages=None, min_position=APPENDIX_MIN_POSITION):
+    """Sammelt Seiten aus dem Iterator 'pages', bis eine Anhang-Überschrift (z.B. 'References') sicher erkannt ist
+
+    Sicher erkannt heißt: die Überschrift steht in einer eigenen Zeile, nicht im vorderen Teil des Dokuments,
+    und der folgende Text sieht wie ein Literaturverzeichnis aus. Der Text der Seite vor der Überschrift bleibt
+    erhalten, alle weiteren Seiten werden nicht mehr abgefragt.
+    """
+    pattern = _heading_pattern(markers)
+    pages = iter(pages)
+    result = []
+    lookahead = None
+    page_num = 0
+    while True:
+        text = lookahead if lookahead is not None else next(pages, None)
+        lookahead = None
+        if text is None:
+            return result
+
+        offset = _last_heading(text, pattern)
+        if offset is not None and (number_of_pages is None or page_num >= min_position * number_of_pages):
+            confirmed = _looks_like_references(text[offset:])
+            if not confirmed:
+                # Überschrift am Seitenende: die nächste Seite entscheidet
+                lookahead = next(pages, None)
+                confirmed = lookahead is None or _looks_like_references(lookahead)
+            if confirmed:
+                print(f"Anhang ab Seite {page_num + 1} erkannt, restliche Seiten werden nicht extrahiert")
+                if text[:offset].strip():
+                    result.append(text[:offset])
+                return result
+
+        result.append(text)
+        page_num += 1
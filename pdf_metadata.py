@@ -0,0 +1,117 @@
+# Lokale Ermittlung von Titel & Autor eines PDFs - ohne LLM-Aufruf
+# 1) Metadaten des Dokuments (/Title, /Author) über PyMuPDF 'doc.metadata'
+# 2) Layout-Heuristik auf der ersten Seite: die Zeile(n) mit der größten Schrift sind der Titel,
+#    die direkt folgenden Zeilen mit Namen sind die Autoren
+#
+# Zu jedem Feld wird eine Konfidenz zwischen 0 und 1 geliefert; liegt sie unter MIN_CONFIDENCE,
+# sollte der Aufrufer auf das LLM zurückfallen.
+
+import re
+import statistics
+
+MIN_CONFIDENCE = 0.6
+
+# Typische Einträge in /Title, die nichts mit dem eigentlichen Titel zu tun haben
+_JUNK_TITLE = re.compile(r"(^untitled|^microsoft word|\.(docx?|pdf|tex|dvi)$|^slide \d+$)", re.IGNORECASE)
+_JUNK_AUTHOR = re.compile(r"^(user|admin|administrator|owner|author|unknown|\W*)$", re.IGNORECASE)
+# Zeilen, nach denen keine Autoren mehr folgen
+_STOP_WORDS = re.compile(r"^(abstract|summary|zusammenfassung|keywords|introduction|\d+\.?\s+introduction)\b", re.IGNORECASE)
+_AFFILIATION = re.compile(r"(universit|department|institut|school|college|laborator|hospital|center|centre|@)", re.IGNORECASE)
+# Fußnotenmarker hinter Autorennamen (Ziffern, *, †, ‡ ...)
+_MARKERS = re.compile(r"[\d*†‡§¶]+(?=[,\s]|$)")
+_NAME = re.compile(r"^[A-ZÄÖÜ][\w'’.-]*(\s+[A-ZÄÖÜ][\w'’.-]*)+$")
+
+
+def _clean(text):
+    return re.sub(r"\s+", " ", text or "").strip()
+
+
+def _first_page_lines(page):
+    # Liefert die Textzeilen der Seite als (y-Position, Schriftgröße, Text), sortiert von oben nach unten
+    lines = []
+    for block in page.get_text("dict")["blocks"]:
+        if block.get("type") != 0:
+            continue
+        for line in block["lines"]:
+            spans = [span for span in line["spans"] if span["text"].strip()]
+            if not spans:
+                continue
+            text = _clean("".join(span["text"] for span in line["spans"]))
+            lines.append((line["bbox"][1], max(span["size"] for span in spans), text, len(text)))
+    lines.sort(key=lambda line: line[0])
+    return lines
+
+
+def _looks_like_names(text):
+    text = _MARKERS.sub("", text)
+    parts = [part.strip() for part in re.split(r",|;|\band\b|\bund\b|&", text) if part.strip()]
+    return bool(parts) and len(text) < 300 and all(_NAME.match(part) for part in parts)
+
+
+def _layout_heuristic(page):
+    lines = _first_page_lines(page)
+    if not lines:
+        return "", 0.0, "", 0.0
+
+    # Schriftgröße des Fließtexts = nach Zeichen gewichteter Median
+    body_size = statistics.median([size for _, size, _, length in lines for _ in range(length)])
+
+    # Der Titel steht in der oberen Hälfte der Seite und hat die größte Schrift
+    upper = [line for line in lines if line[0] < page.rect.height * 0.6 and line[3] >= 3]
+    if not upper:
+        return "", 0.0, "", 0.0
+    title_size = max(size for _, size, _, _ in upper)
+    ratio = title_size / body_size if body_size else 1.0
+
+    first = next(i for i, line in enumerate(lines) if line in upper and line[1] == title_size)
+    last = first
+    while last + 1 < len(lines) and abs(lines[last + 1][1] - title_size) < 0.5:
+        last += 1
+    title = " ".join(line[2] for line in lines[first:last + 1])
+    title_confidence = 0.7 if ratio >= 1.3 else 0.5 if ratio >= 1.15 else 0.0
+
+    # Autoren: die ersten Zeilen nach dem Titel, die wie eine Namensliste aussehen
+    authors = []
+    for _, size, text, _ in lines[last + 1:last + 6]:
+        if _STOP_WORDS.match(text) or (authors and _AFFILIATION.search(text)):
+            break
+        if _looks_like_names(text):
+            authors.append(_MARKERS.sub("", text).strip(" ,"))
+        elif authors:
+            break
+    autor = ", ".join(authors)
+    autor_confidence = 0.6 if autor else 0.0
+
+    return title, title_confidence, autor, autor_confidence
+
+
+def extract_title_and_autor(pdf_bytes):
+    """Liefert {'title', 'title_confidence', 'autor', 'autor_confidence'} aus Metadaten & Layout der ersten Seite"""
+    result = {"title": "", "title_confidence": 0.0, "autor": "", "autor_confidence": 0.0}
+    try:
+        import fitz  # PyMuPDF, erst beim ersten Aufruf laden
+        doc = fitz.open(stream=pdf_bytes, filetype="pdf")
+    except Exception as e:
+        print(f"Fehler in extract_title_and_autor: {e}")
+        return result
+    if len(doc) == 0:
+        return result
+
+    layout_title, layout_title_conf, layout_autor, layout_autor_conf = _layout_heuristic(doc[0])
+    first_page_text = _clean(doc[0].get_text("text")).lower()
+
+    meta_title = _clean(doc.metadata.get("title"))
+    if len(meta_title) >= 10 and not _JUNK_TITLE.search(meta_title):
+        # Metadaten sind oft veraltet - taucht der Titel auch auf Seite 1 auf, ist er sehr wahrscheinlich korrekt
+        result["title"] = meta_title
+        result["title_confidence"] = 0.9 if meta_title.lower() in first_page_text else 0.7
+    elif layout_title:
+        result["title"], result["title_confidence"] = layout_title, layout_title_conf
+
+    meta_autor = _clean(doc.metadata.get("author"))
+    if meta_autor and not _JUNK_AUTHOR.match(meta_autor):
+        result["autor"], result["autor_confidence"] = meta_autor, 0.8
+    elif layout_autor:
+        result["autor"], result["autor_confidence"] = layout_autor, layout_autor_conf
+
+    return result
@@ -0,0 +1,123 @@
+# Lokaler Suchindex für den PDF-Chat in openai_clone_v4.py
+# Statt bei jeder Frage den kompletten Dokumenttext mitzuschicken, werden die Seiten einmal pro Upload in
+# Abschnitte zerlegt und mit BM25 indexiert (NumPy/SciPy Sparse-Matrizen, kein Netzwerkzugriff).
+# Pro Frage gehen dann nur die TOP_K relevantesten Abschnitte inkl. Seitenangabe an das Modell.
+#
+# Der Index wird pro Dokument-Hash im Speicher gehalten (LRU, INDEX_CACHE_SIZE Dokumente).
+
+import re
+import threading
+from collections import OrderedDict
+
+from chunked_summary import CHARS_PER_TOKEN
+
+CHUNK_TOKENS = 300 # Größe eines Abschnitts
+TOP_K = 6 # Anzahl der Abschnitte, die pro Frage mitgeschickt werden
+INDEX_CACHE_SIZE = 16
+
+# BM25 Parameter (Standardwerte)
+K1 = 1.5
+B = 0.75
+
+_TOKEN = re.compile(r"\w\w+", re.UNICODE)
+
+
+def tokenize(text):
+    # Kleinschreibung & einfache Plural-Normalisierung ("proteins" -> "protein"), mehr Stemming braucht es hier nicht
+    return [token[:-1] if len(token) > 4 and token.endswith("s") and not token.endswith("ss") else token
+            for token in _TOKEN.findall(text.lower())]
+
+
+def chunk_pages(pages, chunk_tokens=CHUNK_TOKENS):
+    """Zerlegt die Seiten an Absatzgrenzen in Abschnitte: Liste von (Seitennummer ab 1, Text); Abschnitte bleiben innerhalb einer Seite"""
+    max_chars = chunk_tokens * CHARS_PER_TOKEN
+    chunks = []
+    for page_num, text in enumerate(pages, start=1):
+        current = ""
+        for paragraph in re.split(r"\n\s*\n", text):
+            paragraph = paragraph.strip()
+            if not paragraph:
+                continue
+            if current and len(current) + len(paragraph) > max_chars:
+                chunks.append((page_num, current))
+                current = ""
+            current = f"{current}\n{paragraph}" if current else paragraph
+            while len(current) > max_chars:
+                chunks.append((page_num, current[:max_chars]))
+                current = current[max_chars:]
+        if current:
+            chunks.append((page_num, current))
+    return chunks
+
+
+class BM25Index:
+    def __init__(self, chunks):
+        self.chunks = chunks
+        self.vocabulary = {}
+        rows, cols = [], []
+        for row, (_, text) in enumerate(chunks):
+            for token in tokenize(text):
+                rows.append(row)
+                cols.append(self.vocabulary.setdefault(token, len(self.vocabulary)))
+
+        # Term-Frequenzen als Sparse-Matrix (Abschnitte x Vokabular); doppelte Einträge werden beim Umwandeln aufsummiert
+        import numpy as np  # numpy/scipy erst laden, wenn tatsächlich ein Index gebraucht wird (schnellerer Start)
+        from scipy import sparse
+        shape = (len(chunks), max(len(self.vocabulary), 1))
+        tf = sparse.csr_matrix((np.ones(len(rows), dtype=np.float32), (rows, cols)), shape=shape)
+        tf.sum_duplicates()
+
+        # BM25-Gewichte vorab berechnen, damit eine Suche nur noch ein Matrix-Vektor-Produkt ist
+        doc_len = np.asarray(tf.sum(axis=1)).ravel()
+        avg_len = doc_len.mean() if len(doc_len) else 0.0
+        doc_freq = np.bincount(tf.indices, minlength=shape[1])
+        idf = np.log(1 + (len(chunks) - doc_freq + 0.5) / (doc_freq + 0.5)).astype(np.float32)
+
+        norm = K1 * (1 - B + B * doc_len / avg_len) if avg_len else np.full(len(chunks), K1)
+        weights = tf.copy()
+        row_of_entry = np.repeat(np.arange(shape[0]), np.diff(tf.indptr))
+        weights.data = idf[tf.indices] * tf.data * (K1 + 1) / (tf.data + norm[row_of_entry])
+        self.weights = weights.tocsc()
+
+    def search(self, query, top_k=TOP_K):
+        """Liefert die 'top_k' relevantesten Abschnitte als Liste von (Seitennummer, Text), sortiert nach Seitenzahl"""
+        return [(page, text) for _, page, text in self.scored_search(query, top_k)]
+
+    def scored_search(self, query, top_k=TOP_K):
+        """Wie 'search', aber als Liste von (BM25-Score, Seitennummer, Text) - z.B. um mehrere Dokumente zu mischen"""
+        import numpy as np
+        term_ids = [self.vocabulary[token] for token in tokenize(query) if token in self.vocabulary]
+        if not self.chunks:
+            return []
+        if term_ids:
+            query_vector = np.bincount(term_ids, minlength=self.weights.shape[1]).astype(np.float32)
+            scores = self.weights @ query_vector
+        else:
+            scores = np.zeros(len(self.chunks), dtype=np.float32)
+
+        if not scores.any():
+            # Kein Treffer (z.B. "Fasse das Dokument zusammen") - dann den Anfang des Dokuments verwenden
+            best = np.arange(min(top_k, len(self.chunks)))
+        else:
+            best = np.argsort(-scores, kind="stable")[:top_k]
+            best = best[scores[best] > 0]
+        return [(float(scores[i]), *self.chunks[i]) for i in sorted(best)]
+
+
+_lock = threading.Lock()
+_indexes = OrderedDict()
+
+
+def get_index(doc_hash, pages):
+    """BM25-Index für ein Dokument - wird pro Dokument-Hash nur einmal aufgebaut"""
+    with _lock:
+        if doc_hash in _indexes:
+            _indexes.move_to_end(doc_hash)
+            return _indexes[doc_hash]
+
+    index = BM25Index(chunk_pages(pages))
+    with _lock:
+        _indexes[doc_hash] = index
+        while len(_indexes) > INDEX_CACHE_SIZE:
+            _indexes.popitem(last=False)
+    return index
@@ -0,0 +1,62 @@
+# Vorschaubilder für hochgeladene PDFs (openai_clone_v4.py)
+# Die Seiten werden mit reduziertem Zoom direkt als PNG gerendert (ohne Umweg über PIL) und pro
+# Dokument-Hash, Seite & Breite in einem begrenzten LRU-Cache gehalten - ein Rerun der UI kostet
+# damit keine Rasterisierung mehr.
+
+import threading
+from collections import OrderedDict
+
+import pdf_cache
+import instrumentation
+
+THUMBNAIL_WIDTH = 400 # Breite der Vorschau der ersten Seite in Pixel
+STRIP_WIDTH = 160 # Breite der Seiten im Vorschau-Streifen
+STRIP_PAGES = 6 # Anzahl der Seiten, die im Streifen auf einmal gerendert werden
+CACHE_SIZE = 128 # maximale Anzahl gespeicherter Vorschaubilder
+
+_lock = threading.Lock()
+_thumbnails = OrderedDict()
+_page_counts = {}
+
+
+def _render(pdf_bytes, page_number, width):
+    import fitz  # PyMuPDF, erst beim ersten Vorschaubild laden
+    doc = fitz.open(stream=pdf_bytes, filetype="pdf")
+    page = doc[page_number]
+    zoom = width / page.rect.width
+    pix = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom), alpha=False)
+    return pix.tobytes("png"), len(doc)
+
+
+def thumbnail_png(pdf_bytes, page_number=0, width=THUMBNAIL_WIDTH, doc_hash=None):
+    """PNG-Bytes der Seite 'page_number' (ab 0) mit der Breite 'width' - pro Dokument & Seite nur einmal gerendert"""
+    doc_hash = doc_hash or pdf_cache.document_hash(pdf_bytes)
+    key = (doc_hash, page_number, width)
+    with _lock:
+        if key in _thumbnails:
+            _thumbnails.move_to_end(key)
+            return _thumbnails[key]
+
+    with instrumentation.span("pdf.thumbnail", page=page_number + 1, width=width):
+        png, num_pages = _render(pdf_bytes, page_number, width)
+    with _lock:
+        _page_counts[doc_hash] = num_pages
+        _thumbnails[key] = png
+        while len(_thumbnails) > CACHE_SIZE:
+            _thumbnails.popitem(last=False)
+    return png
+
+
+def page_count(pdf_bytes, doc_hash=None):
+    doc_hash = doc_hash or pdf_cache.document_hash(pdf_bytes)
+    if doc_hash not in _page_counts:
+        import fitz
+        _page_counts[doc_hash] = len(fitz.open(stream=pdf_bytes, filetype="pdf"))
+    return _page_counts[doc_hash]
+
+
+def thumbnail_strip(pdf_bytes, first_page=0, count=STRIP_PAGES, width=STRIP_WIDTH, doc_hash=None):
+    """Vorschaubilder der Seiten first_page .. first_page+count-1 als Liste von (Seitennummer ab 1, PNG-Bytes)"""
+    doc_hash = doc_hash or pdf_cache.document_hash(pdf_bytes)
+    last_page = min(first_page + count, page_count(pdf_bytes, doc_hash))
+    return [(page_number + 1, thumbnail_png(pdf_bytes, page_number, width, doc_hash)) for page_number in range(first_page, last_page)]
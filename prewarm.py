@@ -0,0 +1,42 @@
+# Vorwärmen nach der ersten Anzeige
+# Die schweren Bibliotheken (openai, PyMuPDF, Pillow, numpy/scipy, pypdf) werden erst geladen, wenn sie gebraucht
+# werden - damit erscheint die Oberfläche schneller. Damit die erste Frage bzw. der erste Upload danach nicht auf
+# diese Importe warten muss, lädt ein Hintergrund-Thread sie einmal pro Prozess, sobald die Seite gezeichnet ist,
+# und legt den OpenAI Client & die Caches an.
+#
+# Abschalten über die Systemvariable PREWARM=0 (z.B. für Messungen mit benchmarks/startup.py)
+
+import os
+import time
+import threading
+import importlib
+
+ENABLED = os.getenv("PREWARM", "1") != "0"
+
+_lock = threading.Lock()
+_started = False
+
+
+def _run(modules, resources):
+    start = time.perf_counter()
+    for module in modules:
+        try:
+            importlib.import_module(module)
+        except Exception as e:
+            print(f"Vorwärmen: {module} konnte nicht geladen werden: {e}")
+    for resource in resources:
+        try:
+            resource()
+        except Exception as e:
+            print(f"Vorwärmen: {getattr(resource, '__name__', resource)} fehlgeschlagen: {e}")
+    print(f"Vorwärmen abgeschlossen in {time.perf_counter() - start:.1f}s")
+
+
+def start(modules=(), resources=()):
+    """Am Ende von main() aufrufen: lädt 'modules' & ruft 'resources' (Funktionen ohne Argumente) im Hintergrund auf"""
+    global _started
+    with _lock:
+        if _started or not ENABLED:
+            return
+        _started = True
+    threading.Thread(target=_run, args=(modules, resources), daemon=True, name="prewarm").start()
@@ -0,0 +1,164 @@
+# Prozessweites Rate-Limit für die OpenAI Aufrufe aller Sessions (genutzt von openai_client.chat_completion)
+# Statt dass jede Session unabhängig anfragt und bei Lastspitzen reihenweise 429-Fehler samt Wiederholungen
+# auslöst, teilen sich alle Aufrufe eines Modells zwei Token-Buckets: Anfragen pro Minute & Tokens pro Minute.
+#
+# - Ist der Bucket leer, warten die Aufrufe in einer Warteschlange. Die Sessions kommen reihum dran (Round Robin),
+#   damit eine Session mit vielen langen PDFs (Map-Reduce = viele Aufrufe) die anderen nicht aushungert.
+# - Die Tokens einer Anfrage werden vorab geschätzt (Prompt + max_tokens) und nach der Antwort mit dem
+#   tatsächlichen Verbrauch verrechnet.
+# - Meldet OpenAI trotzdem 429, pausieren alle Aufrufe des Modells für die Dauer des Backoffs.
+# - Messwerte: Wartezeit als Span 'openai.rate_limit', Länge der Warteschlange als Gauge (instrumentation.py)
+# - Die Session eines Aufrufs liefert instrumentation.session_id(); Aufrufe aus Thread-Pools werden ihrer Session
+#   nur zugeordnet, wenn die Funktion mit instrumentation.bind übergeben wird.
+#
+# Konfiguration über Systemvariablen (pro Modell, 0 = kein Limit):
+# - OPENAI_RPM: Anfragen pro Minute, Default 500
+# - OPENAI_TPM: Tokens pro Minute, Default 200000
+
+import os
+import time
+import threading
+from collections import OrderedDict, deque
+
+import instrumentation
+import chunked_summary # estimate_tokens
+
+REQUESTS_PER_MINUTE = int(os.getenv("OPENAI_RPM", "500"))
+TOKENS_PER_MINUTE = int(os.getenv("OPENAI_TPM", "200000"))
+DEFAULT_COMPLETION_TOKENS = 1000 # Schätzung für die Antwort, wenn der Aufruf kein max_tokens angibt
+IMAGE_TOKENS = 1000 # grobe Schätzung je Bild
+LOG_WAIT_SECONDS = 1.0 # längere Wartezeiten im Terminal ausgeben
+
+def estimate_request_tokens(kwargs):
+    """Geschätzte Tokens einer Anfrage (Prompt + maximale Antwortlänge) für den Token-Bucket"""
+    tokens = 0
+    for message in kwargs.get("messages", []):
+        content = message.get("content") or ""
+        if isinstance(content, str):
+            tokens += chunked_summary.estimate_tokens(content)
+            continue
+        for part in content:
+            tokens += IMAGE_TOKENS if part.get("type") == "image_url" else chunked_summary.estimate_tokens(part.get("text", ""))
+    return tokens + (kwargs.get("max_tokens") or kwargs.get("max_completion_tokens") or DEFAULT_COMPLETION_TOKENS)
+
+
+class _Bucket:
+    def __init__(self, per_minute, now):
+        self.capacity = per_minute
+        self.level = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.updated = now
+
+    def _refill(self, now):
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def delay(self, amount, now):
+        # Sekunden, bis 'amount' verfügbar ist; mehr als die Kapazität wird nie verlangt
+        self._refill(now)
+        return max(0.0, (min(amount, self.capacity) - self.level) / self.rate)
+
+    def take(self, amount):
+        self.level -= min(amount, self.capacity)
+
+    def give(self, amount):
+        self.level = min(self.capacity, self.level + amount)
+
+
+class RateLimiter:
+    def __init__(self, model, requests_per_minute=REQUESTS_PER_MINUTE, tokens_per_minute=TOKENS_PER_MINUTE, clock=time.monotonic):
+        self.model = model
+        self._clock = clock # austauschbar für Tests
+        self._requests = _Bucket(requests_per_minute, clock()) if requests_per_minute > 0 else None
+        self._tokens = _Bucket(tokens_per_minute, clock()) if tokens_per_minute > 0 else None
+        self._condition = threading.Condition()
+        self._queues = OrderedDict() # Session -> wartende Aufrufe; die Reihenfolge der Sessions ist der Round Robin
+        self._paused_until = 0.0
+
+    def _delay(self, session, waiter):
+        # None: ein anderer Aufruf ist an der Reihe; sonst Sekunden bis genug Anfragen & Tokens verfügbar sind
+        if next(iter(self._queues)) != session or self._queues[session][0] is not waiter:
+            return None
+        now = self._clock()
+        delays = [self._paused_until - now, 0.0]
+        if self._requests:
+            delays.append(self._requests.delay(1, now))
+        if self._tokens:
+            delays.append(self._tokens.delay(waiter[0], now))
+        return max(delays)
+
+    def _publish_depth(self):
+        instrumentation.set_gauge("openai_queue_depth", sum(len(queue) for queue in self._queues.values()), model=self.model)
+
+    def waiting(self):
+        """Anzahl der Aufrufe, die gerade auf das Limit warten"""
+        with self._condition:
+            return sum(len(queue) for queue in self._queues.values())
+
+    def acquire(self, tokens, session=None):
+        """Wartet, bis die Anfrage an der Reihe ist und das Limit sie zulässt; Rückgabe: Wartezeit in Sekunden
+
+        'session' ist für den Round Robin; ohne Angabe die Session des Aufrufers (instrumentation.session_id)
+        """
+        if self._requests is None and self._tokens is None:
+            return 0.0
+        session = session or instrumentation.session_id()
+        waiter = [tokens] # eigenes Objekt je Aufruf, damit es in der Warteschlange eindeutig ist
+        start = self._clock()
+        with instrumentation.span("openai.rate_limit", model=self.model) as attributes:
+            with self._condition:
+                self._queues.setdefault(session, deque()).append(waiter)
+                attributes["queue"] = sum(len(queue) for queue in self._queues.values())
+                self._publish_depth()
+                try:
+                    while True:
+                        delay = self._delay(session, waiter)
+                        if delay == 0:
+                            break
+                        self._condition.wait(delay)
+                    if self._requests:
+                        self._requests.take(1)
+                    if self._tokens:
+                        self._tokens.take(tokens)
+                finally:
+                    # Auch bei einem Fehler während des Wartens den Platz freigeben, sonst blockiert er alle Sessions.
+                    # Die Session rückt ans Ende der Reihe; als Nächstes ist die nächste Session dran
+                    queue = self._queues.pop(session)
+                    queue.remove(waiter)
+                    if queue:
+                        self._queues[session] = queue
+                    self._publish_depth()
+                    self._condition.notify_all()
+        waited = self._clock() - start
+        if waited >= LOG_WAIT_SECONDS:
+            print(f"Rate-Limit {self.model}: {waited:.1f}s gewartet ({attributes.get('queue', 0)} Anfragen in der Warteschlange)")
+        return waited
+
+    def settle(self, estimated_tokens, used_tokens):
+        """Nach der Antwort: die Schätzung durch den tatsächlichen Verbrauch ersetzen"""
+        if self._tokens is None or used_tokens is None:
+            return
+        with self._condition:
+            if used_tokens < estimated_tokens:
+                self._tokens.give(estimated_tokens - used_tokens)
+            else:
+                self._tokens.take(used_tokens - estimated_tokens)
+            self._condition.notify_all()
+
+    def pause(self, seconds):
+        """Nach einem 429: alle Aufrufe des Modells für 'seconds' anhalten"""
+        with self._condition:
+            self._paused_until = max(self._paused_until, self._clock() + seconds)
+            self._condition.notify_all()
+
+
+_lock = threading.Lock()
+_limiters = {}
+
+
+def limiter(model):
+    """Prozessweiter Limiter je Modell (OpenAI begrenzt Anfragen & Tokens pro Modell)"""
+    with _lock:
+        if model not in _limiters:
+            _limiters[model] = RateLimiter(model)
+        return _limiters[model]
@@ -0,0 +1,123 @@
+# Persistenter Cache für Antworten deterministischer LLM-Aufrufe (temperature=0)
+# Titel, Autor & Zusammenfassung desselben PDFs kosten damit nur beim ersten Mal Tokens und Wartezeit.
+# Genutzt von openai_client.chat_completion, für die aufrufenden Programme transparent.
+#
+# Schlüssel: SHA-256 über Modell, normalisierte Nachrichten und alle Parameter, die die Antwort beeinflussen
+# (nicht: 'stream' und 'timeout' - eine gestreamte Antwort kann später auch ohne Streaming geliefert werden)
+# Ablage: SQLite-Datenbank; Einträge verfallen nach LLM_CACHE_TTL_DAYS, überschreitet die Datenbank
+# LLM_CACHE_MAX_MB, werden die am längsten nicht benutzten Einträge gelöscht.
+#
+# Konfiguration über Systemvariablen:
+# LLM_CACHE_DB (Default ~/.cache/pdf_summary/llm_cache.sqlite3), LLM_CACHE_TTL_DAYS (Default 30),
+# LLM_CACHE_MAX_MB (Default 100, 0 schaltet den Cache ab)
+
+import os
+import json
+import time
+import hashlib
+import sqlite3
+import threading
+
+DB_FILE = os.getenv("LLM_CACHE_DB") or os.path.join(os.path.expanduser("~"), ".cache", "pdf_summary", "llm_cache.sqlite3")
+TTL_SECONDS = float(os.getenv("LLM_CACHE_TTL_DAYS", "30")) * 24 * 3600
+MAX_BYTES = int(float(os.getenv("LLM_CACHE_MAX_MB", "100")) * 1024 * 1024)
+ENABLED = MAX_BYTES > 0
+
+# Parameter ohne Einfluss auf den Inhalt der Antwort
+_IGNORED_PARAMS = ("stream", "stream_options", "timeout", "extra_headers")
+
+_lock = threading.Lock()
+_initialized = False
+_stats = {"hits": 0, "misses": 0}
+
+
+def _connect():
+    global _initialized
+    if not _initialized:
+        os.makedirs(os.path.dirname(DB_FILE) or ".", exist_ok=True)
+    connection = sqlite3.connect(DB_FILE, timeout=30)
+    if not _initialized:
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, response TEXT, size INTEGER, created REAL, last_access REAL, hits INTEGER DEFAULT 0)")
+        connection.execute("CREATE INDEX IF NOT EXISTS responses_last_access ON responses (last_access)")
+        _initialized = True
+    return connection
+
+
+def _normalize(content):
+    # Leerzeichen am Zeilenende und am Anfang/Ende des Prompts ändern die Antwort nicht
+    if isinstance(content, str):
+        return "\n".join(line.rstrip() for line in content.strip().splitlines())
+    return content
+
+
+def cache_key(params):
+    """Schlüssel für die Parameter eines chat.completions.create(...) Aufrufs"""
+    relevant = {name: value for name, value in params.items() if name not in _IGNORED_PARAMS}
+    relevant["messages"] = [{**message, "content": _normalize(message.get("content"))} for message in params.get("messages", [])]
+    return hashlib.sha256(json.dumps(relevant, sort_keys=True, ensure_ascii=False, default=str).encode("utf-8")).hexdigest()
+
+
+def cacheable(params):
+    """Nur deterministische Aufrufe (temperature=0) mit genau einer Antwort werden gespeichert"""
+    return ENABLED and params.get("temperature") == 0 and params.get("n", 1) == 1
+
+
+def get(key):
+    """Gespeicherte Antwort als Dict (Format von ChatCompletion.model_dump()) oder None"""
+    now = time.time()
+    with _lock:
+        connection = _connect()
+        with connection:
+            row = connection.execute("SELECT response, created FROM responses WHERE key = ?", (key,)).fetchone()
+            if row and now - row[1] > TTL_SECONDS:
+                connection.execute("DELETE FROM responses WHERE key = ?", (key,))
+                row = None
+            if row:
+                connection.execute("UPDATE responses SET last_access = ?, hits = hits + 1 WHERE key = ?", (now, key))
+        connection.close()
+        _stats["hits" if row else "misses"] += 1
+    return json.loads(row[0]) if row else None
+
+
+def put(key, response):
+    data = json.dumps(response, ensure_ascii=False)
+    now = time.time()
+    with _lock:
+        connection = _connect()
+        with connection:
+            connection.execute("INSERT OR REPLACE INTO responses (key, response, size, created, last_access) VALUES (?, ?, ?, ?, ?)",
+                               (key, data, len(data), now, now))
+            _evict(connection, now)
+        connection.close()
+
+
+def _evict(connection, now):
+    connection.execute("DELETE FROM responses WHERE created < ?", (now - TTL_SECONDS,))
+    total = connection.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+    if total <= MAX_BYTES:
+        return
+    # Am längsten nicht benutzte Einträge löschen, bis wieder Platz ist
+    for key, size in connection.execute("SELECT key, size FROM responses ORDER BY last_access").fetchall():
+        connection.execute("DELETE FROM responses WHERE key = ?", (key,))
+        total -= size
+        if total <= MAX_BYTES:
+            break
+
+
+def stats():
+    """Treffer & Fehlschläge dieses Prozesses sowie Anzahl & Größe der gespeicherten Antworten"""
+    with _lock:
+        connection = _connect()
+        entries, size = connection.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses").fetchone()
+        connection.close()
+        return {**_stats, "entries": entries, "bytes": size}
+
+
+def clear():
+    with _lock:
+        connection = _connect()
+        with connection:
+            connection.execute("DELETE FROM responses")
+        connection.close()
+        _stats.update(hits=0, misses=0)
@@ -0,0 +1,71 @@
+# Single-Flight: gleichzeitige identische Berechnungen laufen nur einmal
+# Laden z.B. in einer Schulklasse viele Schüler innerhalb von Sekunden dasselbe PDF hoch, würde jede Session
+# den Text extrahieren und Titel & Autor beim Modell erfragen. Mit 'run' führt nur der erste Aufruf je Schlüssel
+# (Dokument-Hash, Vorgang) die Berechnung aus; alle gleichzeitigen Aufrufe mit demselben Schlüssel warten darauf
+# und erhalten dasselbe Ergebnis bzw. denselben Fehler. Danach ist der Schlüssel wieder frei - für spätere
+# Aufrufe sorgen die Caches (pdf_cache, metadata_cache).
+#
+# Zusammenfassungen laufen als Auftrag in summary_jobs.py, der pro Dokument & Modell ebenfalls nur einmal
+# existiert; alle Sessions sehen dort auch den bisher gestreamten Text.
+
+import threading
+
+import instrumentation
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.followers = 0
+
+
+class SingleFlight:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def run(self, key, fn):
+        """Ruft 'fn()' auf - oder wartet auf das Ergebnis eines gleichzeitig laufenden Aufrufs mit demselben 'key'"""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+            else:
+                call.followers += 1
+
+        if leader:
+            try:
+                call.result = fn()
+                return call.result
+            except BaseException as e:
+                call.error = e
+                raise
+            finally:
+                with self._lock:
+                    del self._calls[key]
+                call.done.set()
+                if call.followers:
+                    print(f"Single-Flight {key[1] if isinstance(key, tuple) else key}: Ergebnis mit {call.followers} weiteren Aufrufen geteilt")
+
+        with instrumentation.span("single_flight.wait", operation=key[1] if isinstance(key, tuple) else str(key)):
+            call.done.wait()
+        if call.error is not None:
+            raise call.error
+        return call.result
+
+    def in_flight(self):
+        """Anzahl der gerade laufenden Berechnungen"""
+        with self._lock:
+            return len(self._calls)
+
+
+# Prozessweit, gemeinsam für alle Sessions
+_flights = SingleFlight()
+
+
+def run(key, fn):
+    """Prozessweites Single-Flight; 'key' ist ein Tupel (Dokument-Hash, Vorgang, ...)"""
+    return _flights.run(key, fn)
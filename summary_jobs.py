@@ -0,0 +1,157 @@
+# Warteschlange für Zusammenfassungen (PDF_Summary_Streamlit.py)
+# Die Zusammenfassung läuft in einem Thread-Pool im Hintergrund, der Streamlit-Script-Thread wartet nicht darauf.
+# Status, bisher gestreamter Text und Ergebnis liegen in einer SQLite-Datenbank - ein Reload im Browser
+# oder eine andere Session mit demselben PDF sieht den laufenden bzw. fertigen Auftrag.
+#
+# Schlüssel eines Auftrags ist der Hash des Dokuments plus die Modell-ID (wie im Metadaten-Cache).
+# Status: 'queued' -> 'running' -> 'done' | 'error'
+# Abgeschlossene Aufträge werden nach SUMMARY_JOBS_RETENTION_DAYS gelöscht; 'submit(..., force=True)' erstellt
+# eine fertige Zusammenfassung neu.
+#
+# Konfiguration über Systemvariablen:
+# SUMMARY_JOBS_DB (Default ~/.cache/pdf_summary/jobs.sqlite3), SUMMARY_JOB_WORKERS (Default 2),
+# SUMMARY_JOBS_RETENTION_DAYS (Default 30, 0 = unbegrenzt)
+
+import os
+import time
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import instrumentation
+
+DB_FILE = os.getenv("SUMMARY_JOBS_DB") or os.path.join(os.path.expanduser("~"), ".cache", "pdf_summary", "jobs.sqlite3")
+MAX_WORKERS = int(os.getenv("SUMMARY_JOB_WORKERS", "2"))
+RETENTION_SECONDS = float(os.getenv("SUMMARY_JOBS_RETENTION_DAYS", "30")) * 24 * 3600
+ORPHANED_ERROR = "Der Auftrag wurde abgebrochen (die App wurde neu gestartet)"
+PARTIAL_INTERVAL = 0.5 # gestreamten Zwischenstand höchstens alle 0.5 Sekunden in die Datenbank schreiben
+
+_lock = threading.Lock()
+_executor = None
+_active = set() # Aufträge, die in diesem Prozess in der Warteschlange stehen oder laufen
+_initialized = False
+
+
+def _connect():
+    global _initialized
+    if not _initialized:
+        os.makedirs(os.path.dirname(DB_FILE) or ".", exist_ok=True)
+    connection = sqlite3.connect(DB_FILE, timeout=30)
+    connection.row_factory = sqlite3.Row
+    if not _initialized:
+        connection.execute("PRAGMA journal_mode=WAL") # Lesen (UI) und Schreiben (Worker) blockieren sich nicht
+        connection.execute("""CREATE TABLE IF NOT EXISTS jobs (
+            id TEXT PRIMARY KEY, doc_hash TEXT, model TEXT, status TEXT, partial TEXT, result TEXT, error TEXT,
+            owner INTEGER, created REAL, started REAL, first_output REAL, finished REAL)""")
+        _expire(connection)
+        _initialized = True
+    return connection
+
+
+def _expire(connection):
+    # Abgeschlossene Aufträge nach Ablauf der Haltedauer löschen
+    if RETENTION_SECONDS > 0:
+        with connection:
+            connection.execute("DELETE FROM jobs WHERE status IN ('done', 'error') AND finished < ?", (time.time() - RETENTION_SECONDS,))
+
+
+def _update(job_id, **fields):
+    with _connect() as connection:
+        connection.execute(f"UPDATE jobs SET {', '.join(f'{name} = ?' for name in fields)} WHERE id = ?", (*fields.values(), job_id))
+    connection.close()
+
+
+def _job_id(doc_hash, model):
+    return f"{doc_hash}:{model}"
+
+
+def _get(doc_hash, model):
+    connection = _connect()
+    row = connection.execute("SELECT * FROM jobs WHERE id = ?", (_job_id(doc_hash, model),)).fetchone()
+    connection.close()
+    return dict(row) if row else None
+
+
+def get(doc_hash, model):
+    """Liefert den Auftrag als Dict (Spalten der Tabelle 'jobs') oder None
+
+    Ein wartender oder laufender Auftrag, dessen Prozess nicht mehr existiert (z.B. nach einem Neustart der App),
+    wird als fehlgeschlagen markiert - die Oberfläche bietet dann wieder 'Summary erstellen' an.
+    """
+    with _lock: # 'submit' legt Zeile & Eintrag in '_active' unter derselben Sperre an
+        job = _get(doc_hash, model)
+        if job and job["status"] in ("queued", "running") and _orphaned(job):
+            with _connect() as connection:
+                connection.execute("UPDATE jobs SET status = 'error', error = ?, finished = ? WHERE id = ? AND status IN ('queued', 'running') AND owner = ?",
+                                   (ORPHANED_ERROR, time.time(), job["id"], job["owner"]))
+            connection.close()
+            job = _get(doc_hash, model)
+    return job
+
+
+def _orphaned(job):
+    # Ein Auftrag ohne laufenden Worker (z.B. nach einem Neustart der App)
+    if job["id"] in _active:
+        return False
+    if job["owner"] == os.getpid():
+        return True
+    try:
+        os.kill(job["owner"], 0)
+    except ProcessLookupError:
+        return True
+    except OSError:
+        pass
+    return False
+
+
+def submit(doc_hash, model, work, force=False):
+    """Plant einen Auftrag ein, falls er noch nicht fertig ist oder läuft
+
+    'work(report)' erstellt die Zusammenfassung im Hintergrund und gibt den Text zurück; 'report(text)'
+    kann mit dem bisher erzeugten Text aufgerufen werden, damit die Oberfläche ihn schon anzeigt.
+    Mit 'force=True' wird auch eine fertige Zusammenfassung neu erstellt.
+    """
+    job_id = _job_id(doc_hash, model)
+    with _lock:
+        job = _get(doc_hash, model)
+        if job and (job["status"] == "done" and not force or job["status"] in ("queued", "running") and not _orphaned(job)):
+            return job
+        connection = _connect()
+        _expire(connection)
+        with connection:
+            connection.execute("INSERT OR REPLACE INTO jobs (id, doc_hash, model, status, partial, owner, created) VALUES (?, ?, ?, 'queued', '', ?, ?)",
+                               (job_id, doc_hash, model, os.getpid(), time.time()))
+        connection.close()
+        _active.add(job_id)
+
+        global _executor
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix="summary-job")
+        _executor.submit(_run, job_id, instrumentation.bind(work)) # die OpenAI Aufrufe zählen zur Session, die den Auftrag startet
+        return _get(doc_hash, model)
+
+
+def _run(job_id, work):
+    _update(job_id, status="running", started=time.time())
+    last_write = 0.0
+    first_output = None
+
+    def report(text):
+        nonlocal last_write, first_output
+        now = time.time()
+        if first_output is None and text:
+            first_output = now
+            _update(job_id, first_output=now)
+        if now - last_write >= PARTIAL_INTERVAL:
+            last_write = now
+            _update(job_id, partial=text)
+
+    try:
+        result = work(report)
+        _update(job_id, status="done", result=result, partial=None, finished=time.time()) # Zwischenstand wird nicht mehr gebraucht
+    except Exception as e:
+        print(f"Auftrag {job_id} fehlgeschlagen: {e}")
+        _update(job_id, status="error", error=str(e), finished=time.time())
+    finally:
+        with _lock:
+            _active.discard(job_id)
@@ -0,0 +1,18 @@
+import chunked_summary
+
+
+def test_groups_pages_within_budget():
+    pages = ["a" * 40, "b" * 40, "c" * 40] # je 11 Tokens
+    assert chunked_summary.chunk_pages(pages, max_tokens=25) == [(1, 2, "a" * 40 + "\n\n" + "b" * 40), (3, 3, "c" * 40)]
+
+
+def test_single_chunk_when_everything_fits():
+    pages = ["eins", "zwei", "drei"]
+    assert chunked_summary.chunk_pages(pages, max_tokens=100) == [(1, 3, "eins\n\nzwei\n\ndrei")]
+
+
+def test_splits_oversized_page():
+    pages = ["kurz", "x" * 30 + "\n\n" + "y" * 30, "ende"]
+    chunks = chunked_summary.chunk_pages(pages, max_tokens=10) # 40 Zeichen
+    assert chunks == [(1, 1, "kurz"), (2, 2, "x" * 30), (2, 2, "y" * 30), (3, 3, "ende")]
+    assert all(len(text) <= 40 for _, _, text in chunks)
@@ -0,0 +1,36 @@
+import os
+import sys
+import subprocess
+
+import pytest
+
+import metadata_cache
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture(autouse=True)
+def database(tmp_path, monkeypatch):
+    monkeypatch.setattr(metadata_cache, "DB_FILE", str(tmp_path / "metadata.sqlite3"))
+    monkeypatch.setattr(metadata_cache, "_initialized", False)
+    return metadata_cache.DB_FILE
+
+
+def test_put_and_get():
+    assert metadata_cache.get("hash", "model") is None
+    metadata_cache.put("hash", "model", {"title": "Titel", "autor": "Ärztin", "num_pages": 3})
+    assert metadata_cache.get("hash", "model") == {"title": "Titel", "autor": "Ärztin", "num_pages": 3}
+    assert metadata_cache.get("hash", "anderes-modell") is None
+
+    metadata_cache.put("hash", "model", {"title": "Neu", "autor": "", "num_pages": 3})
+    assert metadata_cache.get("hash", "model")["title"] == "Neu"
+
+
+def test_processes_keep_each_others_entries(database):
+    # Zwei Prozesse schreiben gleichzeitig in dieselbe Datenbank; kein Eintrag darf verloren gehen
+    script = ("import sys, metadata_cache\n"
+              "for i in range(50): metadata_cache.put(f'{sys.argv[1]}{i}', 'model', {'title': str(i)})\n")
+    env = {**os.environ, "METADATA_CACHE_DB": database}
+    processes = [subprocess.Popen([sys.executable, "-c", script, name], cwd=REPO, env=env) for name in ("a", "b")]
+    assert all(process.wait(60) == 0 for process in processes)
+    assert all(metadata_cache.get(f"{name}{i}", "model") == {"title": str(i)} for name in ("a", "b") for i in range(50))
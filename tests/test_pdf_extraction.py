@@ -0,0 +1,34 @@
+import pdf_extraction
+
+REFERENCES = "References\n[1] Smith, A. Caching. 2019.\n[2] Doe, B. Latency. 2020.\n[3] Roe, C. Queues. 2021."
+
+
+def lazy(pages, requested):
+    # Iterator über die Seiten, der mitschreibt, welche Seiten abgefragt wurden
+    for page_num, text in enumerate(pages):
+        requested.append(page_num)
+        yield text
+
+
+def test_stops_at_references_heading():
+    pages = [f"Seite {page_num}" for page_num in range(7)] + [f"Schluss.\n{REFERENCES}", "[4] Weitere Angabe 2018.", "[5] Noch eine 2017."]
+    requested = []
+    result = pdf_extraction.pages_before_appendix(lazy(pages, requested), number_of_pages=len(pages))
+    assert result == pages[:7] + ["Schluss.\n"]
+    assert requested == list(range(8)) # die Seiten hinter der Überschrift werden nicht extrahiert
+
+
+def test_ignores_heading_in_front_part():
+    # Inhaltsverzeichnis auf Seite 1: liegt vor APPENDIX_MIN_POSITION und zählt nicht
+    pages = [f"Inhalt\n{REFERENCES}"] + [f"Seite {page_num}" for page_num in range(1, 10)]
+    assert pdf_extraction.pages_before_appendix(iter(pages), number_of_pages=len(pages)) == pages
+
+
+def test_heading_without_citations_is_kept():
+    pages = [f"Seite {page_num}" for page_num in range(5)] + ["References\nIm Folgenden beschreiben wir die Methode.", "Weiterer Text."]
+    assert pdf_extraction.pages_before_appendix(iter(pages), number_of_pages=len(pages)) == pages
+
+
+def test_heading_at_page_end_checks_next_page():
+    pages = [f"Seite {page_num}" for page_num in range(5)] + ["Schluss.\nReferences", REFERENCES.split("\n", 1)[1], "[4] Angabe 2016."]
+    assert pdf_extraction.pages_before_appendix(iter(pages), number_of_pages=len(pages)) == pages[:5] + ["Schluss.\n"]
@@ -0,0 +1,34 @@
+import pytest
+
+import pdf_retrieval
+
+pytest.importorskip("numpy")
+pytest.importorskip("scipy")
+
+
+def test_tokenize_normalizes_plural():
+    assert pdf_retrieval.tokenize("Proteins and Classes, a B") == ["protein", "and", "classe"]
+
+
+def test_chunks_stay_within_page():
+    pages = ["Absatz eins.\n\nAbsatz zwei.", "Seite zwei."]
+    assert pdf_retrieval.chunk_pages(pages, chunk_tokens=4) == [(1, "Absatz eins."), (1, "Absatz zwei."), (2, "Seite zwei.")]
+
+
+def test_search_ranks_relevant_chunks():
+    index = pdf_retrieval.BM25Index([
+        (1, "The ribosome translates messenger RNA into proteins."),
+        (2, "Earthquakes release energy along faults."),
+        (3, "Population statistics for Mauritius."),
+        (4, "Ribosome structure and ribosome assembly."),
+    ])
+    scored = index.scored_search("ribosome", top_k=2)
+    assert [page for _, page, _ in scored] == [1, 4] # nach Seitenzahl sortiert
+    assert scored[1][0] > scored[0][0] # zwei Treffer im kürzeren Abschnitt
+    assert index.search("earthquake faults", top_k=1) == [(2, "Earthquakes release energy along faults.")]
+
+
+def test_search_without_match_returns_document_start():
+    index = pdf_retrieval.BM25Index([(1, "Erster Abschnitt"), (2, "Zweiter Abschnitt"), (3, "Dritter")])
+    assert index.search("Fasse zusammen", top_k=2) == [(1, "Erster Abschnitt"), (2, "Zweiter Abschnitt")]
+    assert pdf_retrieval.BM25Index([]).search("egal") == []
@@ -0,0 +1,117 @@
+import time
+import threading
+
+import pytest
+
+import rate_limiter
+
+# 7680 Tokens pro Minute = 128 pro Sekunde: ein Token alle 1/128 s, als Gleitkommazahl exakt darstellbar
+TOKENS_PER_MINUTE = 7680
+TOKEN_SECONDS = 1 / 128
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+        self.error = None
+
+    def __call__(self):
+        if self.error:
+            raise self.error
+        return self.now
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "Zeitüberschreitung"
+        time.sleep(0.002)
+
+
+def start(fn, *args):
+    thread = threading.Thread(target=fn, args=args, daemon=True)
+    thread.start()
+    return thread
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+@pytest.fixture
+def limiter(clock):
+    limiter = rate_limiter.RateLimiter("test", requests_per_minute=0, tokens_per_minute=TOKENS_PER_MINUTE, clock=clock)
+    limiter.acquire(TOKENS_PER_MINUTE, session="leer") # Bucket leeren; danach wird nur noch über die Uhr nachgefüllt
+    return limiter
+
+
+def test_sessions_take_turns(clock, limiter):
+    order = []
+    sessions = ["a", "a", "a", "b", "c"]
+    for count, session in enumerate(sessions, start=1):
+        start(lambda session: (limiter.acquire(1, session=session), order.append(session)), session)
+        wait_for(lambda: limiter.waiting() == count)
+
+    # Je Schritt reicht der Bucket für genau einen Aufruf
+    for count in range(1, len(sessions) + 1):
+        clock.now += TOKEN_SECONDS
+        wait_for(lambda: len(order) == count)
+    assert order == ["a", "b", "c", "a", "a"]
+    assert limiter.waiting() == 0
+
+
+def test_pause_delays_all_calls():
+    limiter = rate_limiter.RateLimiter("test", requests_per_minute=600, tokens_per_minute=0)
+    limiter.pause(0.2)
+    assert limiter.acquire(1, session="a") >= 0.15
+    assert limiter.acquire(1, session="b") < 0.1 # die Pause ist vorbei
+
+
+def test_settle_refunds_unused_tokens(clock, limiter):
+    limiter.settle(estimated_tokens=1000, used_tokens=1000 - 128) # 128 Tokens zurück in den Bucket
+    assert limiter.acquire(128, session="a") == 0.0
+
+
+def test_settle_charges_extra_tokens(clock, limiter):
+    limiter.settle(estimated_tokens=100, used_tokens=164) # 64 Tokens nachträglich abziehen
+    done = threading.Event()
+    start(lambda: (limiter.acquire(64, session="a"), done.set()))
+    wait_for(lambda: limiter.waiting() == 1)
+
+    clock.now += 64 * TOKEN_SECONDS # reicht nur für die nachträglich abgezogenen Tokens
+    assert not done.wait(0.1)
+    clock.now += 64 * TOKEN_SECONDS
+    assert done.wait(5)
+
+
+def test_settle_without_usage_changes_nothing(clock, limiter):
+    limiter.settle(estimated_tokens=1000, used_tokens=None)
+    clock.now += TOKEN_SECONDS
+    assert limiter.acquire(1, session="a") == 0.0
+
+
+def test_error_while_waiting_frees_the_queue(clock, limiter):
+    errors = []
+
+    def acquire():
+        try:
+            limiter.acquire(1, session="a")
+        except RuntimeError as e:
+            errors.append(e)
+    thread = start(acquire)
+    wait_for(lambda: limiter.waiting() == 1)
+
+    clock.error = RuntimeError("Uhr kaputt")
+    thread.join(5)
+    assert errors and limiter.waiting() == 0
+
+    # Andere Sessions werden nicht mehr blockiert
+    clock.error = None
+    clock.now += TOKEN_SECONDS
+    assert limiter.acquire(1, session="b") == 0.0
+
+
+def test_without_limits_no_waiting():
+    limiter = rate_limiter.RateLimiter("test", requests_per_minute=0, tokens_per_minute=0)
+    assert limiter.acquire(10**9, session="a") == 0.0
@@ -0,0 +1,82 @@
+import pytest
+
+import response_cache
+
+MESSAGES = [{"role": "user", "content": "Fasse zusammen:\nText"}]
+
+
+class FakeTime:
+    def __init__(self):
+        self.now = 1000.0
+
+    def time(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(tmp_path, monkeypatch):
+    clock = FakeTime()
+    monkeypatch.setattr(response_cache, "DB_FILE", str(tmp_path / "llm_cache.sqlite3"))
+    monkeypatch.setattr(response_cache, "_initialized", False)
+    monkeypatch.setattr(response_cache, "time", clock)
+    response_cache.clear() # auch die Treffer-Statistik
+    return clock
+
+
+def key(**params):
+    return response_cache.cache_key({"model": "gpt-4-turbo", "messages": MESSAGES, "temperature": 0, **params})
+
+
+def test_key_ignores_whitespace_at_line_ends():
+    messages = [{"role": "user", "content": "  Fasse zusammen:   \nText \n\n"}]
+    assert response_cache.cache_key({"model": "gpt-4-turbo", "messages": messages, "temperature": 0}) == key()
+
+
+def test_key_ignores_transport_parameters():
+    assert key(stream=True, stream_options={"include_usage": True}, timeout=30, extra_headers={"X-Test": "1"}) == key()
+
+
+def test_key_depends_on_answer_parameters():
+    assert len({key(), key(model="gpt-4o"), key(max_tokens=100), key(response_format={"type": "json_object"}),
+                response_cache.cache_key({"model": "gpt-4-turbo", "messages": [{"role": "user", "content": "Anders"}], "temperature": 0})}) == 5
+
+
+def test_only_deterministic_calls_are_cacheable():
+    assert response_cache.cacheable({"temperature": 0})
+    assert not response_cache.cacheable({"temperature": 0.7})
+    assert not response_cache.cacheable({})
+    assert not response_cache.cacheable({"temperature": 0, "n": 2})
+
+
+def test_put_and_get(clock):
+    assert response_cache.get("a") is None
+    response_cache.put("a", {"choices": [{"message": {"content": "Antwort"}}]})
+    assert response_cache.get("a") == {"choices": [{"message": {"content": "Antwort"}}]}
+    assert response_cache.stats()["hits"] == 1 and response_cache.stats()["misses"] == 1
+
+
+def test_entries_expire_after_ttl(clock, monkeypatch):
+    monkeypatch.setattr(response_cache, "TTL_SECONDS", 100)
+    response_cache.put("a", {"text": "alt"})
+    clock.now += 99
+    assert response_cache.get("a") == {"text": "alt"}
+    clock.now += 2 # Zugriffe verlängern die Haltedauer nicht
+    assert response_cache.get("a") is None
+    assert response_cache.stats()["entries"] == 0
+
+
+def test_least_recently_used_entries_are_evicted(clock, monkeypatch):
+    entry = {"text": "x" * 90}
+    size = len(response_cache.json.dumps(entry))
+    monkeypatch.setattr(response_cache, "MAX_BYTES", 3 * size)
+    for name in "abc":
+        clock.now += 1
+        response_cache.put(name, entry)
+    clock.now += 1
+    assert response_cache.get("a") is not None # 'a' ist jetzt der zuletzt benutzte Eintrag
+
+    clock.now += 1
+    response_cache.put("d", entry)
+    assert response_cache.get("b") is None
+    assert all(response_cache.get(name) is not None for name in "acd")
+    assert response_cache.stats()["bytes"] <= 3 * size
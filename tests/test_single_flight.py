@@ -0,0 +1,59 @@
+import time
+import threading
+
+import pytest
+
+import single_flight
+
+
+def run_concurrently(flights, key, fn, followers):
+    # Startet den ersten Aufruf und 'followers' weitere mit demselben Schlüssel, solange der erste noch läuft
+    release = threading.Event()
+    results = []
+
+    def leader_fn():
+        release.wait(5)
+        return fn()
+
+    def call(function):
+        try:
+            results.append(("ok", flights.run(key, function)))
+        except Exception as e:
+            results.append(("error", e))
+
+    threads = [threading.Thread(target=call, args=(leader_fn,))]
+    threads[0].start()
+    while flights.in_flight() == 0:
+        time.sleep(0.005)
+    for _ in range(followers):
+        threads.append(threading.Thread(target=call, args=(lambda: pytest.fail("Folgeaufruf ausgeführt"),)))
+        threads[-1].start()
+    while flights._calls[key].followers < followers:
+        time.sleep(0.005)
+    release.set()
+    for thread in threads:
+        thread.join(5)
+    return results
+
+
+def test_followers_share_result():
+    flights = single_flight.SingleFlight()
+    calls = []
+    results = run_concurrently(flights, ("hash", "extract"), lambda: calls.append(1) or "text", followers=3)
+    assert calls == [1]
+    assert results == [("ok", "text")] * 4
+    assert flights.in_flight() == 0
+
+
+def test_error_reaches_followers():
+    flights = single_flight.SingleFlight()
+    error = ValueError("kaputt")
+
+    def fail():
+        raise error
+    results = run_concurrently(flights, ("hash", "extract"), fail, followers=2)
+    assert results == [("error", error)] * 3
+    assert flights.in_flight() == 0
+
+    # Danach ist der Schlüssel wieder frei
+    assert flights.run(("hash", "extract"), lambda: "neu") == "neu"
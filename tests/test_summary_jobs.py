@@ -0,0 +1,52 @@
+import threading
+
+import pytest
+
+import instrumentation
+import summary_jobs
+
+
+@pytest.fixture(autouse=True)
+def database(tmp_path, monkeypatch):
+    monkeypatch.setattr(summary_jobs, "DB_FILE", str(tmp_path / "jobs.sqlite3"))
+    monkeypatch.setattr(summary_jobs, "_initialized", False)
+    monkeypatch.setattr(instrumentation, "session_id", lambda: "test") # ohne Streamlit
+    monkeypatch.setattr(summary_jobs, "MAX_WORKERS", 1) # ein Worker: Aufträge laufen der Reihe nach
+    monkeypatch.setattr(summary_jobs, "_executor", None)
+    yield
+    if summary_jobs._executor is not None:
+        summary_jobs._executor.shutdown(wait=True)
+
+
+def run(text, force=False):
+    # Auftrag einplanen und auf das Ende warten
+    done = threading.Event()
+
+    def work(report):
+        report(text[:3])
+        done.set()
+        return text
+    summary_jobs.submit("hash", "modell", work, force=force)
+    assert done.wait(5)
+    summary_jobs._executor.submit(lambda: None).result(5) # wartet, bis der Worker das Ergebnis geschrieben hat
+    return summary_jobs.get("hash", "modell")
+
+
+def test_finished_job_keeps_only_the_result():
+    job = run("Zusammenfassung")
+    assert job["status"] == "done" and job["result"] == "Zusammenfassung"
+    assert not job["partial"]
+
+
+def test_done_job_is_only_regenerated_on_request():
+    run("alt")
+    job = summary_jobs.submit("hash", "modell", lambda report: "neu")
+    assert job["result"] == "alt"
+    assert run("neu", force=True)["result"] == "neu"
+
+
+def test_old_jobs_expire():
+    run("alt")
+    summary_jobs._update("hash:modell", finished=summary_jobs.time.time() - summary_jobs.RETENTION_SECONDS - 1)
+    summary_jobs.submit("anderer", "modell", lambda report: "")
+    assert summary_jobs.get("hash", "modell") is None
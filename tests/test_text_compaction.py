@@ -0,0 +1,49 @@
+import pytest
+
+import text_compaction
+
+
+@pytest.fixture(autouse=True)
+def enabled(monkeypatch):
+    monkeypatch.setattr(text_compaction, "ENABLED", True)
+
+
+BODY = ["Einleitung und Motivation.", "Methoden im Detail.", "Ergebnisse der Messung.", "Diskussion der Werte.", "Fazit und Ausblick."]
+
+
+def test_removes_repeated_headers_and_page_numbers():
+    pages = [f"Journal of Tests\n{text}\n{text.upper()}\n{page_num + 1}" for page_num, text in enumerate(BODY)]
+    compacted, report = text_compaction.compact_pages(pages)
+    assert compacted[0] == pages[0] # erste Seite bleibt unverändert (Titel & Autor)
+    assert compacted[2] == "Ergebnisse der Messung.\nERGEBNISSE DER MESSUNG."
+    assert report["removed_lines"] == 8
+    assert report["saved_chars"] == report["chars_before"] - report["chars_after"] > 0
+
+
+def test_page_of_pattern_counts_as_header():
+    pages = [f"Page {page_num + 1} of 5\n{text}\n{text.upper()}" for page_num, text in enumerate(BODY)]
+    compacted, _ = text_compaction.compact_pages(pages)
+    assert compacted[1:] == [f"{text}\n{text.upper()}" for text in BODY[1:]]
+
+
+def test_collapses_whitespace():
+    compacted, _ = text_compaction.compact_pages(["Ein   Satz\t mit\n\n\n\nLücken"])
+    assert compacted == ["Ein Satz mit\n\nLücken"]
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("Die Zusammenfassung.\nEine Zusammen-\nfassung.", "Die Zusammenfassung.\nEine Zusammenfassung."), # Wort kommt ungetrennt vor
+    ("Ein self-\nreferential Text.", "Ein self-referential Text."), # unbekannt: Bindestrich bleibt
+    ("Der state-of-the-\nart Ansatz.", "Der state-of-the-art Ansatz."), # vorderer Teil enthält schon einen Bindestrich
+    ("Anhang A-\nB bleibt.", "Anhang A-\nB bleibt."), # Großbuchstabe: keine Worttrennung
+])
+def test_hyphenation(text, expected):
+    assert text_compaction.compact_pages([text])[0] == [expected]
+
+
+def test_disabled_returns_pages_unchanged(monkeypatch):
+    monkeypatch.setattr(text_compaction, "ENABLED", False)
+    pages = ["Zusammen-\nfassung  ", "1"]
+    compacted, report = text_compaction.compact_pages(pages)
+    assert compacted == pages
+    assert report["saved_chars"] == 0
@@ -0,0 +1,101 @@
+import gc
+
+import pytest
+
+import upload_store
+
+
+class FakeTime:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(tmp_path, monkeypatch):
+    clock = FakeTime()
+    monkeypatch.setattr(upload_store, "time", clock)
+    monkeypatch.setattr(upload_store, "IDLE_SECONDS", 60)
+    monkeypatch.setattr(upload_store, "SPILL_BYTES", 1024)
+    monkeypatch.setattr(upload_store, "STORE_DIR", str(tmp_path))
+    return clock
+
+
+@pytest.fixture
+def store(clock):
+    return upload_store.UploadStore()
+
+
+def test_same_file_is_stored_once(store):
+    a, b = upload_store.Owner(), upload_store.Owner()
+    doc_hash = store.add(b"Inhalt", a)
+    assert store.add(b"Inhalt", b) == doc_hash
+    assert store.add(b"Inhalt", a) == doc_hash # dieselbe Session zählt nur einmal
+    assert store._entries[doc_hash].refs == 2
+    assert store.stats() == {"files": 1, "bytes_in_memory": 6, "bytes_mapped": 0}
+
+
+def test_view_returns_content_without_copy(store):
+    doc_hash = store.add(b"Inhalt", upload_store.Owner())
+    view = store.view(doc_hash)
+    assert isinstance(view, memoryview) and view.tobytes() == b"Inhalt"
+    with pytest.raises(KeyError):
+        store.view("unbekannt")
+
+
+def test_released_entries_are_evicted_after_idle_time(clock, store):
+    a, b = upload_store.Owner(), upload_store.Owner()
+    doc_hash = store.add(b"Inhalt", a)
+    store.add(b"Inhalt", b)
+    store.release(doc_hash, a)
+    clock.now += 61
+    store.add(b"anderes", a) # löst die Bereinigung aus
+    assert doc_hash in store # 'b' hält noch eine Referenz
+
+    store.release(doc_hash, b)
+    clock.now += 59
+    store.add(b"anderes", a)
+    assert doc_hash in store
+    clock.now += 2
+    store.add(b"anderes", a)
+    assert doc_hash not in store
+
+
+def test_referenced_entries_are_never_evicted(clock, store):
+    owner = upload_store.Owner()
+    doc_hash = store.add(b"Inhalt", owner)
+    clock.now += 10**6
+    store.add(b"anderes", upload_store.Owner())
+    assert store.view(doc_hash).tobytes() == b"Inhalt"
+
+
+def test_references_of_discarded_sessions_expire(clock, store):
+    owner = upload_store.Owner()
+    doc_hash = store.add(b"Inhalt", owner)
+    del owner # Session beendet, ohne 'release'
+    gc.collect()
+    clock.now += 61
+    store.add(b"anderes", upload_store.Owner())
+    assert doc_hash not in store
+
+
+def test_large_files_are_mapped(store):
+    data = bytes(range(256)) * 8 # 2048 Bytes >= SPILL_BYTES
+    doc_hash = store.add(data, upload_store.Owner())
+    assert store.stats() == {"files": 1, "bytes_in_memory": 0, "bytes_mapped": len(data)}
+    assert store.view(doc_hash).tobytes() == data
+
+
+def test_view_held_while_entry_is_closed(clock, store):
+    data = b"x" * 2048
+    owner = upload_store.Owner()
+    doc_hash = store.add(data, owner)
+    view = store.view(doc_hash)
+    store.release(doc_hash, owner)
+    clock.now += 61
+    store.add(b"anderes", owner) # entfernt den Eintrag, obwohl die View noch existiert
+    assert doc_hash not in store
+    assert view.tobytes() == data
+    view.release()
@@ -0,0 +1,131 @@
+# Kompaktierung des extrahierten PDF-Texts, bevor er an das Modell geht
+# - Kopf- & Fußzeilen, die sich auf vielen Seiten wiederholen (Journal, Kurztitel, "Page 3 of 12"), werden entfernt;
+#   die erste Seite bleibt dabei unverändert, dort stehen Titel & Autor
+# - alleinstehende Seitenzahlen am Seitenanfang bzw. -ende werden entfernt
+# - am Zeilenende getrennte Wörter werden wieder zusammengefügt ("Zusammen-\nfassung" -> "Zusammenfassung"), wenn das
+#   Wort an anderer Stelle im Dokument ungetrennt vorkommt; sonst bleibt der Bindestrich stehen ("self-\nreferential"
+#   -> "self-referential"), ebenso wenn der vordere Teil schon einen Bindestrich enthält ("state-of-the-\nart")
+# - mehrfache Leerzeichen & Leerzeilen werden zusammengefasst
+# 'compact_pages' liefert die Seiten und einen Bericht über die eingesparten Zeichen & (geschätzten) Tokens;
+# 'compacted' macht daraus einen Extraktor für pdf_cache.cached_pages, der den Bericht einmal pro Dokument ausgibt.
+#
+# Abschalten über die Systemvariable PROMPT_COMPACTION=0
+
+import os
+import re
+from collections import Counter
+
+import instrumentation
+from chunked_summary import estimate_tokens
+
+ENABLED = os.getenv("PROMPT_COMPACTION", "1") != "0"
+CACHE_SUFFIX = "-kompakt2" if ENABLED else "" # an den Namen des Extraktors im pdf_cache anhängen (bei geänderten Regeln hochzählen)
+EDGE_LINES = 3 # so viele Zeilen am Anfang & Ende jeder Seite gelten als mögliche Kopf- bzw. Fußzeile
+MIN_REPEAT_SHARE = 0.3 # Anteil der Seiten, auf denen eine Zeile vorkommen muss (gerade/ungerade Seiten haben oft verschiedene Kopfzeilen)
+MIN_REPEAT_PAGES = 3
+
+_PAGE_NUMBER = re.compile(r"^(?:-\s*)?(?:(?:page|seite|p\.|s\.)\s*)?\d{1,4}(?:\s*(?:/|of|von)\s*\d{1,4})?(?:\s*-)?$", re.IGNORECASE)
+_HYPHENATED = re.compile(r"([\w-]*\w)-[ \t]*\n[ \t]*([a-zäöüß]\w*)")
+_WORD = re.compile(r"\w+")
+_SPACES = re.compile(r"[ \t ]+")
+_BLANK_LINES = re.compile(r"\n{3,}")
+
+
+def _line_key(line):
+    # Zeilen mit unterschiedlicher Seitenzahl ("Page 3 of 12", "Page 4 of 12") gelten als gleich
+    return re.sub(r"\d+", "#", _SPACES.sub(" ", line).strip().lower())
+
+
+def _edge_lines(lines):
+    # Indizes der ersten & letzten EDGE_LINES nicht-leeren Zeilen, jeweils von außen nach innen
+    # Getrennte Wörter ("exam-" / "ple") gehören zum Fließtext und kommen nicht in Frage
+    filled = [index for index, line in enumerate(lines) if line.strip()]
+    return _outside_in(lines, filled[:EDGE_LINES]), _outside_in(lines, filled[::-1][:EDGE_LINES])
+
+
+def _outside_in(lines, indices):
+    result = []
+    for index in indices:
+        if lines[index].rstrip().endswith("-") or (index > 0 and lines[index - 1].rstrip().endswith("-")):
+            break
+        result.append(index)
+    return result
+
+
+def repeated_lines(pages):
+    """Kopf- & Fußzeilen (normalisiert), die auf mindestens MIN_REPEAT_SHARE der Seiten vorkommen"""
+    counts = Counter()
+    for text in pages:
+        lines = text.splitlines()
+        top, bottom = _edge_lines(lines)
+        counts.update({_line_key(lines[index]) for index in top + bottom})
+    min_pages = max(MIN_REPEAT_PAGES, MIN_REPEAT_SHARE * len(pages))
+    return {key for key, count in counts.items() if count >= min_pages and key}
+
+
+def vocabulary(pages):
+    """Alle Wörter des Dokuments (klein geschrieben) - Bindestriche & Zeilenumbrüche trennen Wörter"""
+    return {word.lower() for text in pages for word in _WORD.findall(text)}
+
+
+def _join_hyphenated(match, words):
+    left, right = match.group(1), match.group(2)
+    if "-" not in left and (left + right).lower() in words:
+        return left + right
+    return f"{left}-{right}"
+
+
+def _compact_page(text, repeated, strip_edges, words):
+    # Rückgabe: kompaktierter Text und Anzahl der entfernten Kopf- & Fußzeilen
+    lines = text.splitlines()
+    drop = set()
+    if strip_edges:
+        # Kopf- & Fußzeilen bilden einen zusammenhängenden Block am Seitenrand: von außen nach innen entfernen
+        for indices in _edge_lines(lines):
+            for index in indices:
+                if not (_line_key(lines[index]) in repeated or _PAGE_NUMBER.match(lines[index].strip())):
+                    break
+                drop.add(index)
+        lines = [line for index, line in enumerate(lines) if index not in drop]
+    text = "\n".join(_SPACES.sub(" ", line).strip() for line in lines)
+    text = _HYPHENATED.sub(lambda match: _join_hyphenated(match, words), text)
+    return _BLANK_LINES.sub("\n\n", text).strip(), len(drop)
+
+
+def compact_pages(pages):
+    """Kompaktierte Seitentexte und Bericht {'chars_before', 'chars_after', 'saved_chars', 'saved_tokens', 'removed_lines'}"""
+    chars_before = sum(len(text) for text in pages)
+    if not ENABLED:
+        return list(pages), {"chars_before": chars_before, "chars_after": chars_before, "saved_chars": 0, "saved_tokens": 0, "removed_lines": 0}
+
+    repeated = repeated_lines(pages) if len(pages) >= MIN_REPEAT_PAGES else set()
+    words = vocabulary(pages)
+    results = [_compact_page(text, repeated, page_num > 0, words) for page_num, text in enumerate(pages)]
+    compacted = [text for text, _ in results]
+    chars_after = sum(len(text) for text in compacted)
+    report = {
+        "chars_before": chars_before,
+        "chars_after": chars_after,
+        "saved_chars": chars_before - chars_after,
+        "saved_tokens": sum(estimate_tokens(text) for text in pages) - sum(estimate_tokens(text) for text in compacted),
+        "removed_lines": sum(dropped for _, dropped in results),
+    }
+    return compacted, report
+
+
+def describe(report):
+    # Einzeilige Zusammenfassung des Berichts für Terminal & Oberfläche
+    share = report["saved_chars"] / report["chars_before"] if report["chars_before"] else 0
+    return f"Text kompaktiert: {report['saved_chars']} Zeichen ({share:.0%}) bzw. ca. {report['saved_tokens']} Tokens eingespart"
+
+
+def compacted(extract_fn):
+    """Extraktor für pdf_cache.cached_pages: Seiten mit 'extract_fn' extrahieren, danach kompaktieren"""
+    def extract(pdf_bytes):
+        pages = extract_fn(pdf_bytes)
+        with instrumentation.span("text.compact", pages=len(pages)) as attributes:
+            pages, report = compact_pages(pages)
+            attributes.update(saved_chars=report["saved_chars"], saved_tokens=report["saved_tokens"])
+        print(describe(report))
+        return pages
+    return extract
@@ -0,0 +1,122 @@
+# Prozessweiter Speicher für hochgeladene Dateien (openai_clone_v4.py)
+# - Dedupliziert über den SHA-256 Hash: lädt eine zweite Session dieselbe Datei hoch, existiert sie nur einmal
+# - Dateien ab UPLOAD_SPILL_MB werden in eine temporäre Datei geschrieben und per mmap eingeblendet;
+#   das Betriebssystem hält davon nur die gerade gelesenen Seiten im RAM
+# - 'view' liefert eine memoryview ohne Kopie, die fitz.open(stream=...), hashlib & base64 direkt verarbeiten
+# - Jede Session referenziert ihre Dateien über ein eigenes 'Owner'-Objekt ('add' / 'release'); referenzierte Einträge
+#   werden nie gelöscht, Einträge ohne Referenz nach UPLOAD_IDLE_SECONDS. Der Speicher hält die Owner nur schwach:
+#   verwirft Streamlit eine verlassene Session (ohne 'release'), verfallen damit auch ihre Referenzen
+#
+# Konfiguration über Systemvariablen: UPLOAD_SPILL_MB (Default 5), UPLOAD_IDLE_SECONDS (Default 600),
+# UPLOAD_STORE_DIR (Default: temporäres Verzeichnis des Systems)
+
+import os
+import mmap
+import time
+import tempfile
+import threading
+import weakref
+
+import pdf_cache
+
+SPILL_BYTES = int(float(os.getenv("UPLOAD_SPILL_MB", "5")) * 1024 * 1024)
+IDLE_SECONDS = float(os.getenv("UPLOAD_IDLE_SECONDS", "600"))
+STORE_DIR = os.getenv("UPLOAD_STORE_DIR") or None
+
+
+class Owner:
+    """Referenzen einer Session; liegt in st.session_state und verschwindet mit der Session"""
+
+
+class _Entry:
+    def __init__(self, data):
+        self.size = len(data)
+        self.owners = weakref.WeakSet()
+        self.last_access = time.monotonic()
+        self.mapping = None
+        if self.size >= SPILL_BYTES:
+            with tempfile.NamedTemporaryFile(prefix="upload_", dir=STORE_DIR, delete=False) as f:
+                f.write(data)
+                path = f.name
+            with open(path, "rb") as f:
+                self.mapping = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            try:
+                os.unlink(path) # unter Linux/macOS bleibt der Inhalt bis zum Schließen der Abbildung erhalten
+                self.path = None
+            except OSError:
+                self.path = path # Windows: Datei erst beim Löschen des Eintrags entfernen
+            self.data = None
+        else:
+            self.data = bytes(data)
+
+    @property
+    def refs(self):
+        return len(self.owners)
+
+    def view(self):
+        self.last_access = time.monotonic()
+        return memoryview(self.mapping if self.mapping is not None else self.data)
+
+    def close(self):
+        if self.mapping is not None:
+            try:
+                self.mapping.close()
+            except BufferError:
+                pass # es gibt noch Views; die Abbildung wird freigegeben, sobald die letzte verschwindet
+            if self.path:
+                try:
+                    os.unlink(self.path)
+                except OSError:
+                    pass
+
+
+class UploadStore:
+    def __init__(self):
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def add(self, data, owner):
+        """Legt die Datei ab (falls noch nicht vorhanden) und referenziert sie für 'owner'; Rückgabe: Hash als Schlüssel"""
+        doc_hash = pdf_cache.document_hash(data)
+        with self._lock:
+            self._evict()
+            entry = self._entries.get(doc_hash)
+            if entry is None:
+                entry = self._entries[doc_hash] = _Entry(data)
+            entry.owners.add(owner) # je Owner höchstens eine Referenz
+            entry.last_access = time.monotonic()
+        return doc_hash
+
+    def release(self, doc_hash, owner):
+        with self._lock:
+            entry = self._entries.get(doc_hash)
+            if entry is not None:
+                entry.owners.discard(owner)
+                entry.last_access = time.monotonic()
+            self._evict()
+
+    def view(self, doc_hash):
+        """memoryview auf den Inhalt (ohne Kopie); KeyError, falls der Eintrag bereits gelöscht wurde"""
+        with self._lock:
+            return self._entries[doc_hash].view()
+
+    def __contains__(self, doc_hash):
+        with self._lock:
+            return doc_hash in self._entries
+
+    def _evict(self):
+        now = time.monotonic()
+        for doc_hash, entry in list(self._entries.items()):
+            if entry.refs == 0 and now - entry.last_access > IDLE_SECONDS:
+                entry.close()
+                del self._entries[doc_hash]
+
+    def stats(self):
+        with self._lock:
+            in_memory = sum(entry.size for entry in self._entries.values() if entry.mapping is None)
+            mapped = sum(entry.size for entry in self._entries.values() if entry.mapping is not None)
+            return {"files": len(self._entries), "bytes_in_memory": in_memory, "bytes_mapped": mapped}
+
+
+# Prozessweiter Speicher, gemeinsam für alle Sessions
+store = UploadStore()